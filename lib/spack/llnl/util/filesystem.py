@@ -23,7 +23,8 @@
 # Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
 ##############################################################################
 __all__ = ['install', 'expand_user', 'working_dir', 'touch', 'mkdirp',
-           'join_path', 'ancestor', 'can_access', 'filter_file', 'change_sed_delimiter']
+           'join_path', 'ancestor', 'can_access', 'filter_file', 'change_sed_delimiter',
+           'read_json_file', 'write_json_file']
 
 import os
 import sys
@@ -31,6 +32,7 @@ import re
 import shutil
 import errno
 import getpass
+import json
 from contextlib import contextmanager, closing
 from tempfile import NamedTemporaryFile
 
@@ -187,3 +189,40 @@ def ancestor(dir, n=1):
 def can_access(file_name):
     """True if we have read/write access to the file."""
     return os.access(file_name, os.R_OK|os.W_OK)
+
+
+def read_json_file(path, version):
+    """Read a JSON object written by write_json_file().  Returns None
+       if the file is missing or unreadable, or if the object's
+       'version' field is not version."""
+    try:
+        with closing(open(path)) as json_file:
+            data = json.load(json_file)
+    except (IOError, ValueError), e:
+        if os.path.exists(path):
+            tty.debug("Ignoring %s: %s" % (path, e))
+        return None
+
+    if not isinstance(data, dict) or data.get('version') != version:
+        return None
+    return data
+
+
+def write_json_file(path, data):
+    """Atomically write data to path as JSON, creating parent directories
+       as needed.  Data is written to a temporary file first, so readers
+       never see a partial file.  Files written this way are caches, so
+       failing to write is not an error; returns whether the write
+       succeeded."""
+    tmp_path = '%s.%d.tmp' % (path, os.getpid())
+    try:
+        mkdirp(os.path.dirname(path))
+        with closing(open(tmp_path, 'w')) as json_file:
+            json.dump(data, json_file)
+        os.rename(tmp_path, path)
+        return True
+    except (IOError, OSError), e:
+        tty.debug("Could not write %s: %s" % (path, e))
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
@@ -110,27 +110,23 @@ def caller_locals():
        This allows a fucntion to insert variables into its caller's
        scope.  Yes, this is some black magic, and yes it's useful
        for implementing things like depends_on and provides.
+
+       This looks at frames directly rather than using
+       inspect.stack(), which reads source lines for every frame on
+       the stack and is slow enough to show up in package imports.
     """
-    stack = inspect.stack()
-    try:
-        return stack[2][0].f_locals
-    finally:
-        del stack
+    return sys._getframe(2).f_locals
 
 
 def get_calling_package_name():
     """Make sure that the caller is a class definition, and return the
        module's name.
     """
-    stack = inspect.stack()
-    try:
-        # get calling function name (the relation)
-        relation = stack[1][3]
+    # get calling function name (the relation)
+    relation = sys._getframe(1).f_code.co_name
 
-        # Make sure locals contain __module__
-        caller_locals = stack[2][0].f_locals
-    finally:
-        del stack
+    # Make sure locals contain __module__
+    caller_locals = sys._getframe(2).f_locals
 
     if not '__module__' in caller_locals:
         raise ScopeError(relation)
@@ -205,8 +201,10 @@ def key_ordering(cls):
        return the hash of this key.
 
        If a class already has __eq__, __ne__, __lt__, __le__, __gt__, or __ge__
-       defined, this decorator will overwrite them.  If the class does not
-       have a _cmp_key method, then this will raise a TypeError.
+       defined, this decorator will overwrite them.  A __hash__ defined by
+       the class itself is kept, so that classes can cache their hashes.
+       If the class does not have a _cmp_key method, then this will raise
+       a TypeError.
     """
     def setter(name, value):
         value.__name__ = name
@@ -223,7 +221,8 @@ def key_ordering(cls):
     setter('__gt__', lambda s,o: o is None or s._cmp_key() >  o._cmp_key())
     setter('__ge__', lambda s,o: o is None or s._cmp_key() >= o._cmp_key())
 
-    setter('__hash__', lambda self: hash(self._cmp_key()))
+    if '__hash__' not in cls.__dict__:
+        setter('__hash__', lambda self: hash(self._cmp_key()))
 
     return cls
 
@@ -251,14 +250,12 @@ class HashableMap(dict):
 def in_function(function_name):
     """True if the caller was called from some function with
        the supplied Name, False otherwise."""
-    stack = inspect.stack()
-    try:
-        for elt in stack[2:]:
-            if elt[3] == function_name:
-                return True
-        return False
-    finally:
-        del stack
+    frame = sys._getframe(2)
+    while frame is not None:
+        if frame.f_code.co_name == function_name:
+            return True
+        frame = frame.f_back
+    return False
 
 
 class RequiredAttributeError(ValueError):
@@ -44,6 +44,7 @@ var_path       = join_path(prefix, "var", "spack")
 stage_path     = join_path(var_path, "stage")
 install_path   = join_path(prefix, "opt")
 share_path     = join_path(prefix, "share", "spack")
+cache_path     = join_path(var_path, "cache")
 
 #
 # Set up the packages database.
@@ -73,9 +74,32 @@ install_layout = SpecHashDirectoryLayout(install_path)
 # Replace it with a subclass if you want different
 # policies.
 #
-from spack.concretize import DefaultConcretizer
+from spack.concretize import DefaultConcretizer, ConcretizationCache
 concretizer = DefaultConcretizer()
 
+#
+# Concrete specs are cached here so that unchanged specs do
+# not need to be concretized again.
+#
+concretization_cache = ConcretizationCache(join_path(cache_path, "concretize"))
+
+#
+# Results of checking packages' dependency constraints are kept here.
+#
+from spack.package import DependencyValidationCache
+dependency_validation_cache = DependencyValidationCache(
+    join_path(cache_path, "validated_dependencies.json"))
+
+#
+# Caches collect new entries as Spack runs and are written
+# out once, when it exits.
+#
+import atexit
+def _save_caches():
+    dependency_validation_cache.save()
+    db.metadata_cache.save()
+atexit.register(_save_caches)
+
 # Version information
 from spack.version import Version
 spack_version = Version("0.8")
@@ -31,6 +31,7 @@ from llnl.util.lang import attr_setdefault
 
 import spack
 import spack.spec
+import spack.concretize
 
 # cmd has a submodule called "list" so preserve the python list module
 python_list = list
@@ -90,10 +91,12 @@ def parse_specs(args, **kwargs):
 
     try:
         specs = spack.spec.parse(args)
-        for spec in specs:
-            if concretize:
-                spec.concretize() # implies normalize
-            elif normalize:
+        if concretize:
+            # implies normalize
+            specs = spack.concretize.concretize_specs(
+                specs, spack.concretization_cache)
+        elif normalize:
+            for spec in specs:
                 spec.normalize()
 
         return specs
@@ -65,8 +65,10 @@ def find(parser, args):
         if not query_specs:
             return
 
-    specs = [s for s in spack.db.installed_package_specs()
-             if not query_specs or any(s.satisfies(q) for q in query_specs)]
+    if query_specs:
+        specs = spack.db.get_installed(*query_specs)
+    else:
+        specs = spack.db.installed_package_specs()
 
     # Make a dict with specs keyed by architecture and compiler.
     index = index_by(specs, 'architecture', 'compiler')
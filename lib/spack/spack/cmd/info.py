@@ -37,14 +37,14 @@ def setup_parser(subparser):
     subparser.add_argument('name', metavar="PACKAGE", nargs='?', help="name of packages to get info on")
 
 
-def format_doc(pkg, **kwargs):
+def format_doc(doc, **kwargs):
     """Wrap doc string at 72 characters and format nicely"""
     indent = kwargs.get('indent', 0)
 
-    if not pkg.__doc__:
+    if not doc:
         return ""
 
-    doc = re.sub(r'\s+', ' ', pkg.__doc__)
+    doc = re.sub(r'\s+', ' ', doc)
     lines = textwrap.wrap(doc, 72)
     results = StringIO()
     for line in lines:
@@ -68,7 +68,11 @@ def rst_table(elts):
 
 def info_rst():
     """Print out information on all packages in restructured text."""
-    pkgs = sorted(spack.db.all_packages(), key=lambda s:s.name.lower())
+    # Package metadata has everything needed here, so this does not
+    # import packages whose metadata is cached.
+    pkgs = sorted((spack.db.metadata(name)
+                   for name in spack.db.all_package_names()),
+                  key=lambda s:s.name.lower())
 
     print "Package List"
     print "=================="
@@ -101,10 +105,10 @@ def info_rst():
         if pkg.dependencies:
             print "Dependencies"
             print "  " + ", ".join("`%s`_" % d if d != "mpi" else d
-                                   for d in pkg.dependencies)
+                                   for d in sorted(pkg.dependencies))
             print
         print "Description"
-        print format_doc(pkg, indent=2)
+        print format_doc(pkg.doc, indent=2)
         print
         print "-----"
 
@@ -144,7 +148,7 @@ def info_text(pkg):
     print
     print "Description:"
     if pkg.__doc__:
-        print format_doc(pkg, indent=4)
+        print format_doc(pkg.__doc__, indent=4)
     else:
         print "    None"
 
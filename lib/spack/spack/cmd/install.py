@@ -43,6 +43,9 @@ def setup_parser(subparser):
     subparser.add_argument(
         '-n', '--no-checksum', action='store_true', dest='no_checksum',
         help="Do not check packages against checksum")
+    subparser.add_argument(
+        '--prefer-installed', action='store_true', dest='prefer_installed',
+        help="Reuse installed versions, compilers and providers when possible.")
     subparser.add_argument(
         'packages', nargs=argparse.REMAINDER, help="specs of packages to install")
 
@@ -54,6 +57,9 @@ def install(parser, args):
     if args.no_checksum:
         spack.do_checksum = False
 
+    if args.prefer_installed:
+        spack.concretizer.prefer_installed = True
+
     specs = spack.cmd.parse_specs(args.packages, concretize=True)
     for spec in specs:
         package = spack.db.get(spec)
@@ -24,6 +24,7 @@
 ##############################################################################
 from external import argparse
 import spack.cmd
+import spack.concretize
 
 import llnl.util.tty as tty
 
@@ -33,10 +34,20 @@ import spack
 description = "print out abstract and concrete versions of a spec."
 
 def setup_parser(subparser):
+    subparser.add_argument(
+        '--prefer-installed', action='store_true', dest='prefer_installed',
+        help="Reuse installed versions, compilers and providers when possible.")
     subparser.add_argument('specs', nargs=argparse.REMAINDER, help="specs of packages")
 
 def spec(parser, args):
-    for spec in spack.cmd.parse_specs(args.specs):
+    if args.prefer_installed:
+        spack.concretizer.prefer_installed = True
+
+    specs = spack.cmd.parse_specs(args.specs)
+    concrete_specs = spack.concretize.concretize_specs(
+        specs, spack.concretization_cache)
+
+    for spec, concrete in zip(specs, concrete_specs):
         print "Input spec"
         print "------------------------------"
         print spec.tree(color=True, indent=2)
@@ -48,5 +59,4 @@ def spec(parser, args):
 
         print "Concretized"
         print "------------------------------"
-        spec.concretize()
-        print spec.tree(color=True, indent=2)
+        print concrete.tree(color=True, indent=2)
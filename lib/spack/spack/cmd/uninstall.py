@@ -82,7 +82,7 @@ def uninstall(parser, args):
     # Sort packages to be uninstalled by the number of installed dependents
     # This ensures we do things in the right order
     def num_installed_deps(pkg):
-        return len(pkg.installed_dependents)
+        return len(spack.install_layout.installed_dependent_paths(pkg.spec))
     pkgs.sort(key=num_installed_deps)
 
     # Uninstall packages in order now.
@@ -28,7 +28,7 @@ system and configuring Spack to use multiple compilers.
 import imp
 import os
 
-from llnl.util.lang import memoized, list_modules
+from llnl.util.lang import memoized, list_modules, index_by
 from llnl.util.filesystem import join_path
 
 import spack
@@ -76,6 +76,61 @@ def _get_config():
     return spack.config.get_config(refresh=True)
 
 
+class _CompilerRegistry(object):
+    """Compilers configured in one Spack configuration.  Compiler specs
+       are read from the config once and indexed by name, and Compiler
+       objects are built on first use and then reused.
+    """
+    def __init__(self, config):
+        self.config = config
+        self.specs = [spack.spec.CompilerSpec(s)
+                      for s in config.get_section_names('compiler')]
+        self.by_name = index_by(self.specs, 'name')
+        self._compilers = {}
+
+
+    def find(self, compiler_spec):
+        return [c for c in self.by_name.get(compiler_spec.name, [])
+                if c.satisfies(compiler_spec)]
+
+
+    def compiler(self, cspec):
+        """Get the Compiler object for a configured compiler spec."""
+        if cspec not in self._compilers:
+            self._compilers[cspec] = self._make_compiler(cspec)
+        return self._compilers[cspec]
+
+
+    def _make_compiler(self, cspec):
+        items = dict((k,v) for k,v in
+                     self.config.items('compiler "%s"' % cspec))
+
+        if not all(n in items for n in _required_instance_vars):
+            raise InvalidCompilerConfigurationError(cspec)
+
+        cls  = class_for_compiler_name(cspec.name)
+        compiler_paths = []
+        for c in _required_instance_vars:
+            compiler_path = items[c]
+            if compiler_path != "None":
+                compiler_paths.append(compiler_path)
+            else:
+                compiler_paths.append(None)
+
+        return cls(cspec, *compiler_paths)
+
+
+_registry = None
+
+def _compiler_registry():
+    """Get the compiler registry for the current configuration.  It is
+       rebuilt only when the configuration is reloaded."""
+    global _registry
+    if _registry is None or _registry.config is not spack.config.get_config():
+        _registry = _CompilerRegistry(_get_config())
+    return _registry
+
+
 @memoized
 def default_compiler():
     versions = []
@@ -127,6 +182,9 @@ def add_compilers_to_config(scope, *compilers):
         add_compiler(config, compiler)
     config.write()
 
+    # Reload so that the new compilers are visible.
+    spack.config.get_config(refresh=True)
+
 
 def add_compiler(config, compiler):
     def setup_field(cspec, name, exe):
@@ -156,16 +214,14 @@ def all_compilers():
     """Return a set of specs for all the compiler versions currently
        available to build with.  These are instances of CompilerSpec.
     """
-    configuration = _get_config()
-    return [spack.spec.CompilerSpec(s)
-            for s in configuration.get_section_names('compiler')]
+    return list(_compiler_registry().specs)
 
 
 @_auto_compiler_spec
 def find(compiler_spec):
     """Return specs of available compilers that match the supplied
        compiler spec.  Return an list if nothing found."""
-    return [c for c in all_compilers() if c.satisfies(compiler_spec)]
+    return _compiler_registry().find(compiler_spec)
 
 
 @_auto_compiler_spec
@@ -173,27 +229,8 @@ def compilers_for_spec(compiler_spec):
     """This gets all compilers that satisfy the supplied CompilerSpec.
        Returns an empty list if none are found.
     """
-    config = _get_config()
-
-    def get_compiler(cspec):
-        items = dict((k,v) for k,v in config.items('compiler "%s"' % cspec))
-
-        if not all(n in items for n in _required_instance_vars):
-            raise InvalidCompilerConfigurationError(cspec)
-
-        cls  = class_for_compiler_name(cspec.name)
-        compiler_paths = []
-        for c in _required_instance_vars:
-            compiler_path = items[c]
-            if compiler_path != "None":
-                compiler_paths.append(compiler_path)
-            else:
-                compiler_paths.append(None)
-
-        return cls(cspec, *compiler_paths)
-
-    matches = find(compiler_spec)
-    return [get_compiler(cspec) for cspec in matches]
+    registry = _compiler_registry()
+    return [registry.compiler(cspec) for cspec in registry.find(compiler_spec)]
 
 
 @_auto_compiler_spec
@@ -206,6 +243,7 @@ def compiler_for_spec(compiler_spec):
     return compilers[0]
 
 
+@memoized
 def class_for_compiler_name(compiler_name):
     """Given a compiler module name, get the corresponding Compiler class."""
     assert(supported(compiler_name))
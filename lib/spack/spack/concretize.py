@@ -33,7 +33,15 @@ or user preferences.
 TODO: make this customizable and allow users to configure
       concretization  policies.
 """
+import hashlib
+from StringIO import StringIO
+
+import llnl.util.tty as tty
+from llnl.util.filesystem import join_path, read_json_file, write_json_file
+
+import spack
 import spack.spec
+import spack.config
 import spack.compilers
 import spack.architecture
 import spack.error
@@ -42,39 +50,55 @@ from spack.version import *
 
 
 class DefaultConcretizer(object):
-    """This class doesn't have any state, it just provides some methods for
-       concretization.  You can subclass it to override just some of the
-       default concretization strategies, or you can override all of them.
+    """This class provides some methods for concretization.  You can
+       subclass it to override just some of the default concretization
+       strategies, or you can override all of them.
+
+       If prefer_installed is True, versions, compilers and providers
+       are chosen to match already installed packages whenever those
+       satisfy the constraints on the spec.  This lets new packages
+       reuse installed dependencies instead of rebuilding them.
     """
+    def __init__(self, prefer_installed=False):
+        self.prefer_installed = prefer_installed
+
+
+    def _installed_matches(self, spec):
+        """Installed specs that satisfy the constraints on this node of
+           spec, newest version first.  Empty if prefer_installed is off.
+        """
+        if not self.prefer_installed:
+            return []
+
+        matches = spack.install_layout.query(spec.copy(deps=False))
+        return sorted(matches, key=lambda s: s.version, reverse=True)
+
 
     def concretize_version(self, spec):
         """If the spec is already concrete, return.  Otherwise take
            the most recent available version, and default to the package's
            version if there are no avaialble versions.
 
-           TODO: In many cases we probably want to look for installed
-                 versions of each package and use an installed version
-                 if we can link to it.  The policy implemented here will
-                 tend to rebuild a lot of stuff becasue it will prefer
-                 a compiler in the spec to any compiler already-
-                 installed things were built with.  There is likely
-                 some better policy that finds some middle ground
-                 between these two extremes.
+           If prefer_installed is set, the newest installed version that
+           satisfies the spec is used instead, so that the install can
+           be reused.
         """
         # return if already concrete.
         if spec.versions.concrete:
             return
 
+        installed = self._installed_matches(spec)
+        if installed:
+            spec.versions = ver([installed[0].version])
+            return
+
         # If there are known avaialble versions, return the most recent
         # version that satisfies the spec
         pkg = spec.package
-        valid_versions = [v for v in pkg.available_versions
-                          if any(v.satisfies(sv) for sv in spec.versions)]
-
-        if valid_versions:
-            spec.versions = ver([valid_versions[-1]])
-        else:
+        newest = pkg.available_version_catalog.newest_satisfying(spec.versions)
+        if newest is None:
             raise NoValidVersionError(spec)
+        spec.versions = ver([newest])
 
 
     def concretize_architecture(self, spec):
@@ -111,6 +135,10 @@ class DefaultConcretizer(object):
            this one has a strict compiler requirement.  Otherwise, try to
            build with the compiler that will be used by libraries that
            link to this one, to maximize compatibility.
+
+           If prefer_installed is set, a compiler that an installed
+           build of the package used is taken first, as long as it
+           satisfies the nearest ancestor's compiler.
         """
         all_compilers = spack.compilers.all_compilers()
 
@@ -122,7 +150,17 @@ class DefaultConcretizer(object):
         try:
             nearest = next(p for p in spec.traverse(direction='parents')
                            if p.compiler is not None).compiler
+        except StopIteration:
+            nearest = None
+
+        installed = [s.compiler for s in self._installed_matches(spec)
+                     if s.compiler in all_compilers and
+                     (nearest is None or s.compiler.satisfies(nearest))]
+        if installed:
+            spec.compiler = installed[0].copy()
+            return
 
+        if nearest is not None:
             if not nearest in all_compilers:
                 # Take the newest compiler that saisfies the spec
                 matches = sorted(spack.compilers.find(nearest))
@@ -135,22 +173,255 @@ class DefaultConcretizer(object):
 
             spec.compiler = nearest.copy()
 
-        except StopIteration:
+        else:
             spec.compiler = spack.compilers.default_compiler().copy()
 
 
     def choose_provider(self, spec, providers):
         """This is invoked for virtual specs.  Given a spec with a virtual name,
            say "mpi", and a list of specs of possible providers of that spec,
-           select a provider and return it.
+           select a provider and return it.  If prefer_installed is set,
+           providers that are installed are chosen over ones that are not.
         """
         assert(spec.virtual)
         assert(providers)
 
-        index = spack.spec.index_specs(providers)
-        first_key = sorted(index.keys())[0]
-        latest_version = sorted(index[first_key])[-1]
-        return latest_version
+        installed = [p for p in providers if self._installed_matches(p)]
+        if installed:
+            providers = installed
+
+        # Take the latest version of the first provider by name.
+        first_name = min(p.name for p in providers)
+        return max(p for p in providers if p.name == first_name)
+
+
+class BatchConcretizer(object):
+    """Wraps another concretizer and memoizes its decisions, so that
+       specs concretized together make each choice once.  Version and
+       provider choices depend only on the constraints on the node being
+       concretized, so identical subproblems get identical answers in
+       every spec of the batch.  Everything else is delegated to the
+       wrapped concretizer.
+    """
+    def __init__(self, concretizer):
+        self.concretizer = concretizer
+        self._versions = {}
+        self._providers = {}
+
+
+    def __getattr__(self, name):
+        return getattr(self.concretizer, name)
+
+
+    def concretize_version(self, spec):
+        if spec.versions.concrete:
+            return
+
+        key = (spec.name, str(spec.versions), str(spec.compiler),
+               str(spec.variants), spec.architecture)
+        if key not in self._versions:
+            self.concretizer.concretize_version(spec)
+            self._versions[key] = spec.versions
+        spec.versions = self._versions[key].copy()
+
+
+    def choose_provider(self, spec, providers):
+        key = (str(spec), tuple(sorted(str(p) for p in providers)))
+        if key not in self._providers:
+            self._providers[key] = self.concretizer.choose_provider(
+                spec, providers)
+        return self._providers[key]
+
+
+def concretize_specs(specs, cache=None, concretizer=None):
+    """Concretize a list of specs together and return concrete copies
+       of them, in order.  The specs passed in are not modified.
+
+       Identical specs are concretized only once and share the same
+       concrete result.  The concretizer (spack.concretizer by default)
+       is wrapped in a BatchConcretizer so that subproblems shared by
+       several specs, e.g. picking an MPI provider or a version of
+       libelf, are solved once.  If a ConcretizationCache is supplied,
+       it is consulted for each distinct spec.
+    """
+    if concretizer is None:
+        concretizer = spack.concretizer
+    batch = BatchConcretizer(concretizer)
+
+    if cache:
+        concretize = lambda s: cache.concretized(s, batch)
+    else:
+        concretize = lambda s: s.concretized(batch)
+
+    concrete = {}
+    for spec in specs:
+        key = str(spec)
+        if key not in concrete:
+            concrete[key] = concretize(spec)
+
+    return [concrete[str(spec)] for spec in specs]
+
+
+class ConcretizationCache(object):
+    """On-disk cache of concrete specs.  Entries are keyed by the
+       abstract spec, the package repository, the available compilers,
+       the contents of the site and user configuration, the sys_type
+       and the Spack version.  Each entry also records
+       hashes of the package files that went into it, including all
+       providers of virtual dependencies, a hash of what every package
+       declares it provides for those virtuals, and a hash of the list
+       of package names.  An entry is only used if these still match,
+       so editing or adding packages invalidates it.
+    """
+    _cache_version = 2
+
+    def __init__(self, root):
+        self.root = root
+
+
+    def concretized(self, spec, concretizer=None):
+        """Return a concrete copy of spec, from the cache if possible.
+           The spec passed in is not modified.  Specs that are not in
+           the cache are concretized with concretizer, or with
+           spack.concretizer if none is supplied."""
+        if spec.concrete:
+            return spec.copy()
+
+        if concretizer is None:
+            concretizer = spack.concretizer
+
+        path = self.path_for_key(self.key(spec, concretizer))
+        concrete = self._read(path)
+        if concrete is None:
+            concrete = spec.concretized(concretizer)
+            self._write(path, concrete)
+        return concrete
+
+
+    def key(self, spec, concretizer=None):
+        """Hash of the inputs that identify a concretization of spec."""
+        if concretizer is None:
+            concretizer = spack.concretizer
+
+        compilers = sorted(str(c) for c in spack.compilers.all_compilers())
+        sha = hashlib.sha1()
+        for part in (str(spec), spack.db.root, ' '.join(compilers),
+                     self._config_fingerprint(),
+                     spack.architecture.sys_type(), str(spack.spack_version),
+                     self._installed_fingerprint(concretizer)):
+            sha.update(part)
+            sha.update('\0')
+        return sha.hexdigest()
+
+
+    def _config_fingerprint(self):
+        """The merged configuration says where compilers are and how
+           they're set up, so changing it must change the key."""
+        out = StringIO()
+        spack.config.get_config().write(out)
+        return out.getvalue()
+
+
+    def _installed_fingerprint(self, concretizer):
+        """When the concretizer prefers installed packages, the result
+           depends on what is installed, so that goes into the key."""
+        if not getattr(concretizer, 'prefer_installed', False):
+            return ''
+        layout = spack.install_layout
+        return ' '.join(sorted(layout.relative_path_for_spec(s)
+                               for s in spack.db.installed_package_specs()))
+
+
+    def path_for_key(self, key):
+        return join_path(self.root, key + '.json')
+
+
+    def _package_hash(self, pkg_name):
+        with open(spack.db.filename_for_package_name(pkg_name)) as pkg_file:
+            return hashlib.sha1(pkg_file.read()).hexdigest()
+
+
+    def _package_names_hash(self):
+        names = '\n'.join(spack.db.all_package_names())
+        return hashlib.sha1(names).hexdigest()
+
+
+    def _providers_hash(self, virtuals):
+        """Hash of the provider index entries for some virtual packages.
+           Package file hashes only cover packages that were providers
+           when the entry was written; this also changes when another
+           package starts to provide one of the virtuals."""
+        providers = spack.db.get_provider_index().providers
+        entries = sorted('%s %s' % (provided, provider)
+                         for vname in virtuals
+                         for provided, provider
+                         in providers.get(vname, {}).items())
+        return hashlib.sha1('\n'.join(entries)).hexdigest()
+
+
+    def _inputs(self, concrete):
+        """Packages whose files determine how a spec concretizes: all
+           packages in the concrete DAG, and all providers of virtual
+           packages that any of them depend on.  The virtuals and their
+           provider index entries are recorded too."""
+        names = set()
+        virtuals = set()
+        for spec in concrete.traverse():
+            names.add(spec.name)
+            pkg_class = spack.db.get_class_for_package_name(spec.name)
+            virtuals.update(name for name in pkg_class.dependencies
+                            if not spack.db.exists(name))
+
+        for vname in virtuals:
+            providers = spack.db.providers_for(spack.spec.Spec(vname))
+            names.update(p.name for p in providers)
+
+        return { 'package_names' : self._package_names_hash(),
+                 'packages'      : dict((name, self._package_hash(name))
+                                        for name in names),
+                 'virtuals'      : sorted(virtuals),
+                 'providers'     : self._providers_hash(virtuals) }
+
+
+    def _read(self, path):
+        """Return the concrete spec cached at path, or None if there is
+           no entry or the entry is out of date."""
+        entry = read_json_file(path, self._cache_version)
+        if entry is None:
+            return None
+
+        try:
+            inputs = entry['inputs']
+            if inputs['package_names'] != self._package_names_hash():
+                return None
+
+            if inputs['providers'] != self._providers_hash(inputs['virtuals']):
+                return None
+
+            for name, pkg_hash in inputs['packages'].items():
+                if (not spack.db.exists(name) or
+                    self._package_hash(name) != pkg_hash):
+                    return None
+
+            concrete = spack.spec.Spec.from_dict(entry['spec'])
+
+        except (IOError, OSError, ValueError, KeyError, TypeError,
+                IndexError, spack.spec.SpecError), e:
+            tty.debug("Ignoring bad concretization cache entry %s: %s"
+                      % (path, e))
+            return None
+
+        for spec in concrete.traverse():
+            spec._normal = True
+            spec._concrete = True
+        return concrete
+
+
+    def _write(self, path, concrete):
+        """Store a concrete spec at path."""
+        write_json_file(path, { 'version' : self._cache_version,
+                                'inputs'  : self._inputs(concrete),
+                                'spec'    : concrete.to_dict() })
 
 
 class UnavailableCompilerVersionError(spack.error.SpackError):
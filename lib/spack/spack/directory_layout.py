@@ -27,16 +27,29 @@ import os
 import exceptions
 import hashlib
 import shutil
+import time
+import json
+import itertools
 from contextlib import closing
 
 import llnl.util.tty as tty
-from llnl.util.filesystem import join_path, mkdirp
+from llnl.util.filesystem import join_path, mkdirp, read_json_file, write_json_file
 
 import spack
 from spack.spec import Spec
 from spack.error import SpackError
 
 
+# Version of the install index file format.  Bump this to force old
+# indexes to be rebuilt.
+_index_version = 3
+
+# Seconds of directory mtime granularity to allow for.  Some filesystems,
+# like NFS, record mtimes in whole seconds, so a prefix created in the
+# same second as a scan doesn't change the mtime the scan saw.
+_mtime_granularity = 2
+
+
 def _check_concrete(spec):
     """If the spec is not concrete, raise a ValueError"""
     if not spec.concrete:
@@ -71,6 +84,29 @@ class DirectoryLayout(object):
         raise NotImplementedError()
 
 
+    def installed_dependents(self, spec):
+        """To be implemented by subclasses to return specs of all
+           installed packages whose DAGs include the provided spec."""
+        raise NotImplementedError()
+
+
+    def installed_dependent_paths(self, spec):
+        """Return install prefixes of all installed packages whose DAGs
+           include the provided spec.  Subclasses can override this to
+           avoid building the dependents' specs.
+        """
+        return [self.path_for_spec(s) for s in self.installed_dependents(spec)]
+
+
+    def query(self, *query_specs):
+        """Return all installed specs that satisfy any of the supplied
+           query specs.  Subclasses can override this to avoid testing
+           every installed spec.
+        """
+        return [s for s in self.all_specs()
+                if any(s.satisfies(q) for q in query_specs)]
+
+
     def path_for_spec(self, spec):
         """Return an absolute path from the root to a directory for the spec."""
         _check_concrete(spec)
@@ -128,15 +164,49 @@ class SpecHashDirectoryLayout(DirectoryLayout):
        in a file called .spec in each directory, so you can migrate an entire
        install directory to a new hash size pretty easily.
 
+       Spec files are JSON documents written by Spec.to_json().  They can
+       be read back without running the spec parser or loading packages.
+       Older spec files, which contain the output of Spec.tree(), can
+       still be read.
+
        TODO: make a tool to migrate install directories to different hash sizes.
+
+       To avoid reading every spec file on each query, the layout also
+       keeps an index of installed specs in a file at the top of the
+       install root.  The index records the contents of each spec file,
+       grouped by <architecture>/<compiler> directory, along with the
+       mtime of each of those directories.  Only directories whose mtime
+       has changed since the index was written are rescanned.  Mtimes
+       too recent to tell apart from later changes are not recorded, so
+       those directories are rescanned until their mtimes settle.
+
+       Each index entry also lists the prefixes of the spec's
+       dependencies, so that installed dependents of a spec can be
+       found without reading every installed spec.
     """
     def __init__(self, root, **kwargs):
         """Prefix size is number of characters in the SHA-1 prefix to use
            to make each hash unique.
         """
         spec_file_name   = kwargs.get('spec_file_name', '.spec')
+        index_file_name  = kwargs.get('index_file_name', '.spack-index')
         super(SpecHashDirectoryLayout, self).__init__(root)
         self.spec_file_name = spec_file_name
+        self.index_file_name = index_file_name
+
+        # In-memory copy of the install index; loaded lazily.
+        self._index = None
+
+        # Map from prefix to prefixes of installed specs that depend
+        # on it.  Built from the index on demand.
+        self._dependents = None
+
+        # Map from package name -> compiler name -> list of
+        # (relative path, root node) pairs for installed specs, used to
+        # prefilter queries by name and compiler.  Versions and
+        # architectures are checked on the root nodes.  Built from the
+        # index on demand.
+        self._query_index = None
 
 
     def relative_path_for_spec(self, spec):
@@ -148,28 +218,48 @@ class SpecHashDirectoryLayout(DirectoryLayout):
     def write_spec(self, spec, path):
         """Write a spec out to a file."""
         with closing(open(path, 'w')) as spec_file:
-            spec_file.write(spec.tree(ids=False, cover='nodes'))
+            spec_file.write(spec.to_json())
 
 
     def read_spec(self, path):
         """Read the contents of a file and parse them as a spec"""
         with closing(open(path)) as spec_file:
-            # Specs from files are assumed normal and concrete
-            spec = Spec(spec_file.read().replace('\n', ''))
-
-        # If we do not have a package on hand for this spec, we know
-        # it is concrete, and we *assume* that it is normal. This
-        # prevents us from trying to fetch a non-existing package, and
-        # allows best effort for commands like spack find.
-        if not spack.db.exists(spec.name):
-            spec._normal = True
-            spec._concrete = True
+            text = spec_file.read()
+
+        if text.lstrip().startswith('{'):
+            return self._spec_from_dict(json.loads(text))
         else:
-            spec.normalize()
-            if not spec.concrete:
-                tty.warn("Spec read from installed package is not concrete:",
-                         path, spec)
+            return self._read_tree_spec(text)
+
 
+    def _spec_from_dict(self, data):
+        """Build a spec from its dict representation.  Specs from files
+           are known to be normal and concrete, so mark them that way.
+           Installed specs never change, so they are also frozen.
+        """
+        spec = Spec.from_dict(data)
+        for s in spec.traverse():
+            s._normal = True
+            s._concrete = True
+        return spec.freeze()
+
+
+    def _read_tree_spec(self, text):
+        """Read a spec file in the old format, which is just the
+           output of spec.tree().  Specs from files are concrete.
+
+           If we do not have a package on hand for this spec, we
+           *assume* that it is normal.  This prevents us from trying to
+           fetch a non-existing package, and allows best effort for
+           commands like spack find.  Otherwise, normalization is
+           deferred until something needs the spec's package, so that
+           reading specs doesn't import any package files.
+        """
+        spec = Spec(text.replace('\n', ''), concrete=True)
+        if spack.db.exists(spec.name):
+            spec._lazy_normal = True
+        else:
+            spec._normal = True
         return spec
 
 
@@ -203,21 +293,241 @@ class SpecHashDirectoryLayout(DirectoryLayout):
                     'Spec file in %s does not match SHA-1 hash!'
                     % spec_file_path)
 
+        # Bring the index up to date *before* creating the new prefix,
+        # so that the new directory doesn't force a rescan.
+        index = self._update_index()
+
         mkdirp(path)
         self.write_spec(spec, spec_file_path)
 
+        parent, dir_name = os.path.split(self.relative_path_for_spec(spec))
+        entry = index.setdefault(parent, {'specs' : {}})
+        entry['specs'][dir_name] = self._index_entry(spec)
+        self._rescan_dir(parent)
+        self._clear_derived_indexes()
+        self._write_index()
 
-    def all_specs(self):
-        if not os.path.isdir(self.root):
-            return
 
-        for path in traverse_dirs_at_depth(self.root, 3):
-            arch, compiler, last_dir = path
+    def _rescan_dir(self, rel_dir):
+        """Record the current mtime of an <arch>/<compiler> directory in
+           the index, and pick up prefixes that other processes created
+           since the index was last brought up to date.  The mtime is read
+           *before* scanning, so later changes still force a rescan.
+        """
+        entry = self._index[rel_dir]
+        entry['mtime'] = self._settled_mtime(rel_dir)
+        entry['specs'] = self._scan_dir(rel_dir, entry['specs'])
+
+
+    def _settled_mtime(self, rel_dir):
+        """Return the mtime of a directory under the root, or None if it
+           is within _mtime_granularity of now.  Such an mtime may not
+           change when another prefix is created in the directory, so it
+           can't show that the directory is unchanged.
+        """
+        mtime = os.stat(join_path(self.root, rel_dir)).st_mtime
+        if mtime > time.time() - _mtime_granularity:
+            return None
+        return mtime
+
+
+    def remove_path_for_spec(self, spec):
+        index = self._update_index()
+        super(SpecHashDirectoryLayout, self).remove_path_for_spec(spec)
+
+        parent, dir_name = os.path.split(self.relative_path_for_spec(spec))
+        if parent in index:
+            parent_path = join_path(self.root, parent)
+            if os.path.isdir(parent_path):
+                index[parent]['specs'].pop(dir_name, None)
+                self._rescan_dir(parent)
+            else:
+                del index[parent]
+            self._clear_derived_indexes()
+            self._write_index()
+
+
+    def _dependent_relative_paths(self, spec):
+        """Look up relative paths of installed dependents of a spec in
+           the reverse-dependency index, building it if necessary."""
+        self._update_index()
+        if self._dependents is None:
+            self._dependents = {}
+            for rel_dir, entry in self._index.iteritems():
+                for dir_name, spec_entry in entry['specs'].iteritems():
+                    path = join_path(rel_dir, dir_name)
+                    for dep_path in spec_entry['deps']:
+                        self._dependents.setdefault(dep_path, []).append(path)
+
+        return sorted(self._dependents.get(self.relative_path_for_spec(spec), []))
+
+
+    def installed_dependent_paths(self, spec):
+        """Return install prefixes of all installed packages that depend
+           on the supplied concrete spec.  This is a lookup in the
+           reverse-dependency index and does not read any specs.
+        """
+        return [join_path(self.root, path)
+                for path in self._dependent_relative_paths(spec)]
+
+
+    def installed_dependents(self, spec):
+        return [self._spec_for_relative_path(path)
+                for path in self._dependent_relative_paths(spec)]
+
+
+    def query(self, *query_specs):
+        """Find installed specs that satisfy any of the query specs.
+
+           Candidates are looked up by package name and compiler in an
+           index over the install index, and their root nodes are
+           checked against the query without dependencies.  Full Spec
+           objects are only built and checked with satisfies() for
+           specs that are likely to match.
+        """
+        self._update_index()
+        if self._query_index is None:
+            self._query_index = {}
+            for rel_dir, entry in self._index.iteritems():
+                for dir_name, spec_entry in entry['specs'].iteritems():
+                    root = spec_entry['spec']['spec'][0]
+                    name = next(iter(root))
+                    node = Spec.from_node_dict(root)
+                    by_compiler = self._query_index.setdefault(name, {})
+                    compiler_name = node.compiler.name if node.compiler else None
+                    by_compiler.setdefault(compiler_name, []).append(
+                        (join_path(rel_dir, dir_name), node))
+
+        matches = {}
+        for query in query_specs:
+            by_compiler = self._query_index.get(query.name, {})
+            if query.compiler:
+                candidates = by_compiler.get(query.compiler.name, [])
+            else:
+                candidates = itertools.chain(*by_compiler.values())
+
+            for path, node in candidates:
+                if path in matches or not node.satisfies(query, deps=False):
+                    continue
+                spec = self._spec_for_relative_path(path)
+                if spec.satisfies(query):
+                    matches[path] = spec
+
+        return [matches[path] for path in sorted(matches)]
+
+
+    def _spec_for_relative_path(self, path):
+        """Build the spec installed at a path relative to the root from
+           the index."""
+        parent, dir_name = os.path.split(path)
+        return self._spec_from_dict(self._index[parent]['specs'][dir_name]['spec'])
+
+
+    def _clear_derived_indexes(self):
+        """Forget indexes derived from the install index after it changes."""
+        self._dependents = None
+        self._query_index = None
+
+
+    def index_file_path(self):
+        """Gets full path to the install index file."""
+        return join_path(self.root, self.index_file_name)
+
+
+    def _read_index(self):
+        """Read the index file from the install root.  Returns an empty
+           index if the file is missing or unreadable.
+        """
+        index = read_json_file(self.index_file_path(), _index_version)
+        return index.get('dirs', {}) if index else {}
+
+
+    def _write_index(self):
+        """Write the in-memory index to the install root.  If this
+           fails, the index is just rebuilt next time.
+        """
+        write_json_file(self.index_file_path(),
+                        { 'version' : _index_version,
+                          'dirs'    : self._index })
+
+
+    def _update_index(self):
+        """Load the index if necessary and bring it up to date with the
+           install tree.  Only <arch>/<compiler> directories whose mtime
+           differs from the one recorded in the index, or for which no
+           mtime was recorded, are rescanned.  Returns the up-to-date index.
+        """
+        if self._index is None:
+            self._index = self._read_index()
+        old_index = self._index
+
+        index = {}
+        changed = False
+        if os.path.isdir(self.root):
+            for parent in traverse_dirs_at_depth(self.root, 2):
+                rel_dir = join_path(*parent)
+                mtime = self._settled_mtime(rel_dir)
+
+                old_entry = old_index.get(rel_dir)
+                entry = old_entry
+                if (entry is None or entry.get('mtime') is None or
+                    entry['mtime'] != mtime):
+                    old_specs = entry['specs'] if entry else {}
+                    entry = { 'mtime' : mtime,
+                              'specs' : self._scan_dir(rel_dir, old_specs) }
+                    changed = changed or entry != old_entry
+                index[rel_dir] = entry
+
+        if changed or set(index) != set(old_index):
+            self._index = index
+            self._clear_derived_indexes()
+            self._write_index()
+
+        return self._index
+
+
+    def _index_entry(self, spec):
+        """Build the index entry for an installed spec: its dict
+           representation and the prefixes of all of its dependencies.
+        """
+        # Placing dependencies requires the full DAG structure.
+        if spec._lazy_normal:
+            spec.normalize()
+
+        try:
+            deps = sorted(set(self.relative_path_for_spec(dep)
+                              for dep in spec.traverse(root=False)))
+        except ValueError:
+            # Dependencies of specs whose packages spack doesn't know
+            # about can't be placed, so we can't track their dependents.
+            deps = []
+        return { 'spec' : spec.to_dict(), 'deps' : deps }
+
+
+    def _scan_dir(self, rel_dir, old_specs):
+        """Build index entries for every install prefix in an
+           <arch>/<compiler> directory.  Entries already in old_specs
+           are reused rather than re-read from disk.
+        """
+        specs = {}
+        parent_path = join_path(self.root, rel_dir)
+        for dir_name in os.listdir(parent_path):
             spec_file_path = join_path(
-                self.root, arch, compiler, last_dir, self.spec_file_name)
-            if os.path.exists(spec_file_path):
-                spec = self.read_spec(spec_file_path)
-                yield spec
+                parent_path, dir_name, self.spec_file_name)
+            if dir_name in old_specs:
+                specs[dir_name] = old_specs[dir_name]
+            elif os.path.isfile(spec_file_path):
+                specs[dir_name] = self._index_entry(
+                    self.read_spec(spec_file_path))
+        return specs
+
+
+    def all_specs(self):
+        index = self._update_index()
+        for rel_dir in sorted(index):
+            specs = index[rel_dir]['specs']
+            for dir_name in sorted(specs):
+                yield self._spec_from_dict(specs[dir_name]['spec'])
 
 
 class DirectoryLayoutError(SpackError):
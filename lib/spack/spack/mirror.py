@@ -37,6 +37,7 @@ from llnl.util.filesystem import *
 
 import spack
 import spack.error
+import spack.concretize
 import spack.fetch_strategy as fs
 from spack.spec import Spec
 from spack.stage import Stage
@@ -71,17 +72,22 @@ def get_matching_versions(specs, **kwargs):
             tty.msg("No safe (checksummed) versions for package %s." % pkg.name)
             continue
 
+        # Generate only versions that satisfy the spec, newest first.
+        catalog = pkg.version_catalog
+        versions = catalog.satisfying(spec.versions)
+        versions.reverse()
+
+        # Only consider the newest num_versions known versions of each
+        # package, whether or not they satisfy the spec.
         num_versions = kwargs.get('num_versions', 0)
-        for i, v in enumerate(reversed(sorted(pkg.versions))):
-            # Generate no more than num_versions versions for each spec.
-            if num_versions and i >= num_versions:
-                break
+        if num_versions:
+            oldest = catalog[max(0, len(catalog.versions) - num_versions)]
+            versions = [v for v in versions if v >= oldest]
 
-            # Generate only versions that satisfy the spec.
-            if v.satisfies(spec.versions):
-                s = Spec(pkg.name)
-                s.versions = VersionList([v])
-                matching.append(s)
+        for v in versions:
+            s = Spec(pkg.name)
+            s.versions = VersionList([v])
+            matching.append(s)
 
     return matching
 
@@ -120,8 +126,7 @@ def create(path, specs, **kwargs):
     # Get concrete specs for each matching version of these specs.
     version_specs = get_matching_versions(
         specs, num_versions=kwargs.get('num_versions', 0))
-    for s in version_specs:
-        s.concretize()
+    version_specs = spack.concretize.concretize_specs(version_specs)
 
     # Get the absolute path of the root before we start jumping around.
     mirror_root = os.path.abspath(path)
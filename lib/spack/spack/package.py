@@ -35,6 +35,7 @@ README.
 """
 import os
 import re
+import hashlib
 import inspect
 import subprocess
 import platform as py_platform
@@ -61,6 +62,9 @@ from spack.util.compression import allowed_archive, extension
 """Allowed URL schemes for spack packages."""
 _ALLOWED_URL_SCHEMES = ["http", "https", "ftp", "file", "git"]
 
+"""Package._dependency_signature() results, by package class."""
+_dependency_signatures = {}
+
 
 class Package(object):
     """This is the superclass for all spack packages.
@@ -359,11 +363,9 @@ class Package(object):
         for v in sorted(self.versions):
             assert(isinstance(self.versions[v], dict))
 
-        # Version-ize the keys in versions dict
-        try:
-            self.versions = dict((Version(v), h) for v,h in self.versions.items())
-        except ValueError, e:
-            raise ValueError("In package %s: %s" % (self.name, e.message))
+        # Keys are already Versions (checked above), so a copy of the
+        # class's versions dict is all this instance needs.
+        self.versions = dict(self.versions)
 
         # stage used to build this package.
         self._stage = None
@@ -527,7 +529,61 @@ class Package(object):
            that for details.
 
            TODO: investigate validating virtual dependencies.
+
+           The result only depends on the dependency declarations of the
+           packages involved, so it is cached in
+           spack.dependency_validation_cache, keyed by a hash of them.
+        """
+        cache = spack.dependency_validation_cache
+        signature = self._dependency_signature()
+        if signature in cache:
+            error = cache[signature]
+        else:
+            error = self._find_dependency_conflict()
+            cache[signature] = error
+
+        if error:
+            raise InvalidPackageDependencyError(error)
+
+
+    def _dependency_signature(self):
+        """Hash of the dependency declarations of this package and all
+           non-virtual packages it depends on, i.e. of everything
+           validate_dependencies() looks at.  This reads the package
+           classes directly and does not instantiate any packages.
+           Declarations don't change once a class is loaded, so the
+           result is kept for each class.
         """
+        cls = type(self)
+        if cls not in _dependency_signatures:
+            _dependency_signatures[cls] = self._compute_dependency_signature()
+        return _dependency_signatures[cls]
+
+
+    def _compute_dependency_signature(self):
+        sha = hashlib.sha1()
+        visited = set()
+        stack = [self.name]
+        while stack:
+            name = stack.pop()
+            if name in visited:
+                continue
+            visited.add(name)
+
+            deps = spack.db.get_class_for_package_name(name).dependencies
+            sha.update(name)
+            for dep_name in sorted(deps):
+                sha.update('\0' + str(deps[dep_name]))
+                if not deps[dep_name].virtual:
+                    stack.append(dep_name)
+            sha.update('\n')
+        return sha.hexdigest()
+
+
+    def _find_dependency_conflict(self):
+        """Merge the constraints on each dependency of this package and
+           its dependencies.  Returns an error message if they conflict,
+           or None if they are consistent."""
         # This algorithm just attempts to merge all the constraints on the same
         # package together, loses information about the source of the conflict.
         # What we'd really like to know is exactly which two constraints
@@ -544,9 +600,10 @@ class Package(object):
                         merged[name].constrain(spec)
 
         except spack.spec.UnsatisfiableSpecError, e:
-            raise InvalidPackageDependencyError(
-                "Package %s has inconsistent dependency constraints: %s"
-                % (self.name, e.message))
+            return ("Package %s has inconsistent dependency constraints: %s"
+                    % (self.name, e.message))
+
+        return None
 
 
     def provides(self, vpkg_name):
@@ -568,11 +625,7 @@ class Package(object):
     def installed_dependents(self):
         """Return a list of the specs of all installed packages that depend
            on this one."""
-        dependents = []
-        for spec in spack.db.installed_package_specs():
-            if self.name != spec.name and self.spec in spec:
-                dependents.append(spec)
-        return dependents
+        return spack.install_layout.installed_dependents(self.spec)
 
 
     @property
@@ -874,6 +927,31 @@ class Package(object):
         return self._available_versions
 
 
+    @property
+    def version_catalog(self):
+        """Sorted catalog of the versions in this package's class.  It is
+           built the first time it's needed and then shared by all
+           instances of the class."""
+        cls = type(self)
+        if cls.__dict__.get('_version_catalog') is None:
+            cls._version_catalog = VersionCatalog(cls.versions)
+        return cls._version_catalog
+
+
+    @property
+    def available_version_catalog(self):
+        """Sorted catalog of available_versions.  Unlike version_catalog,
+           this folds versions that have another version as a prefix
+           into it (3.0.1 through 3.0.4 become 3.0), so it picks the
+           same versions that a search of available_versions would.
+           It is kept on the class like version_catalog."""
+        cls = type(self)
+        if cls.__dict__.get('_available_version_catalog') is None:
+            cls._available_version_catalog = VersionCatalog(
+                self.available_versions)
+        return cls._available_version_catalog
+
+
     @property
     def available_versions(self):
         # If the package overrode available_versions, then use that.
@@ -886,6 +964,53 @@ class Package(object):
             return vlist
 
 
+class DependencyValidationCache(object):
+    """Results of Package.validate_dependencies(), stored in a JSON file
+       so that they survive across runs.  Results are keyed by the hash
+       of the dependency declarations they were computed from, so
+       changing the dependencies of a package, or of anything it depends
+       on, invalidates them.  Each result is None for consistent
+       dependencies, or the error message for inconsistent ones.
+    """
+    _cache_version = 1
+
+    def __init__(self, path):
+        self.path = path
+        self._results = None
+        self._dirty = False
+
+
+    def _load(self):
+        if self._results is None:
+            data = read_json_file(self.path, self._cache_version)
+            self._results = data.get('results', {}) if data else {}
+        return self._results
+
+
+    def __contains__(self, signature):
+        return signature in self._load()
+
+
+    def __getitem__(self, signature):
+        return self._load()[signature]
+
+
+    def __setitem__(self, signature, error):
+        """Record a result.  It is written out by save()."""
+        self._load()[signature] = error
+        self._dirty = True
+
+
+    def save(self):
+        """Write the cache out if results were added."""
+        if not self._dirty:
+            return
+
+        if write_json_file(self.path, { 'version' : self._cache_version,
+                                        'results' : self._results }):
+            self._dirty = False
+
+
 def find_versions_of_archive(archive_url, **kwargs):
     list_url   = kwargs.get('list_url', None)
     list_depth = kwargs.get('list_depth', 1)
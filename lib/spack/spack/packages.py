@@ -27,13 +27,16 @@ import sys
 import inspect
 import glob
 import imp
+import hashlib
 
 import llnl.util.tty as tty
-from llnl.util.filesystem import join_path
+from llnl.util.filesystem import join_path, read_json_file, write_json_file
 from llnl.util.lang import memoized
 
+import spack
 import spack.error
 import spack.spec
+from spack.version import Version
 from spack.virtual import ProviderIndex
 from spack.util.naming import mod_to_class, validate_module_name
 
@@ -60,6 +63,8 @@ class PackageDB(object):
         self.root = root
         self.instances = {}
         self.provider_index = None
+        self.metadata_cache = PackageMetadataCache(self)
+        self._metadata = {}
 
 
     @_autospec
@@ -73,8 +78,14 @@ class PackageDB(object):
 
         if not spec in self.instances:
             package_class = self.get_class_for_package_name(spec.name)
+
+            # Freeze concrete keys so that lookups don't rehash them.
+            key = spec.copy()
+            if key._concrete:
+                key.freeze()
+
             try:
-                self.instances[spec.copy()] = package_class(spec)
+                self.instances[key] = package_class(spec)
             except Exception, e:
                 raise FailedConstructorError(spec.name, e)
 
@@ -92,23 +103,53 @@ class PackageDB(object):
         self.instances.clear()
 
 
-    @_autospec
-    def get_installed(self, spec):
-        """Get all the installed specs that satisfy the provided spec constraint."""
-        return [s for s in self.installed_package_specs() if s.satisfies(spec)]
+    def get_installed(self, *specs):
+        """Get all the installed specs that satisfy any of the provided
+           spec constraints."""
+        specs = [s if isinstance(s, spack.spec.Spec) else spack.spec.Spec(s)
+                 for s in specs]
+        return spack.install_layout.query(*specs)
 
 
-    @_autospec
-    def providers_for(self, vpkg_spec):
+    def get_provider_index(self):
+        """Return the ProviderIndex of all packages, building it on
+           first use."""
         if self.provider_index is None:
-            self.provider_index = ProviderIndex(self.all_package_names())
+            self.provider_index = self._build_provider_index()
+        return self.provider_index
 
-        providers = self.provider_index.providers_for(vpkg_spec)
+
+    @_autospec
+    def providers_for(self, vpkg_spec):
+        providers = self.get_provider_index().providers_for(vpkg_spec)
         if not providers:
             raise UnknownPackageError("No such virtual package: %s" % vpkg_spec)
         return providers
 
 
+    def _build_provider_index(self):
+        """Build a ProviderIndex of all packages from their metadata, so
+           that only packages whose files changed are imported."""
+        pkg_names = self.all_package_names()
+        index = ProviderIndex([])
+        for name in pkg_names:
+            index.update_provided(
+                spack.spec.Spec(name), self.metadata(name).provided)
+
+        self.metadata_cache.prune(pkg_names)
+        self.metadata_cache.save()
+        return index
+
+
+    def metadata(self, pkg_name):
+        """Get PackageMetadata for a package.  This is served from the
+           metadata cache, so the package file is only imported if it
+           changed since it was last read."""
+        if pkg_name not in self._metadata:
+            self._metadata[pkg_name] = self.metadata_cache.get(pkg_name)
+        return self._metadata[pkg_name]
+
+
     def dirname_for_package_name(self, pkg_name):
         """Get the directory name for a particular package.  This is the
            directory that contains its package.py file."""
@@ -131,15 +172,10 @@ class PackageDB(object):
 
     def installed_package_specs(self):
         """Read installed package names straight from the install directory
-           layout.
+           layout.  Installed specs are concrete, and they are normalized
+           lazily, so this does not load any packages.
         """
-        # Get specs from the directory layout but ensure that they're
-        # all normalized properly.
-        installed = []
-        for spec in spack.install_layout.all_specs():
-            spec.normalize()
-            installed.append(spec)
-        return installed
+        return list(spack.install_layout.all_specs())
 
 
     def installed_known_package_specs(self):
@@ -227,17 +263,19 @@ class PackageDB(object):
             return '"%s"' % string
 
         deps = []
-        for pkg in self.all_packages():
+        for name in self.all_package_names():
+            pkg = self.metadata(name)
             out.write('  %-30s [label="%s"]\n' % (quote(pkg.name), pkg.name))
 
             # Add edges for each depends_on in the package.
-            for dep_name, dep in pkg.dependencies.iteritems():
+            for dep_name in sorted(pkg.dependencies):
                 deps.append((pkg.name, dep_name))
 
             # If the package provides something, add an edge for that.
-            for provider in set(p.name for p in pkg.provided):
+            for provider in sorted(set(p.name for p in pkg.provided)):
                 deps.append((provider, pkg.name))
 
+        self.metadata_cache.save()
         out.write('\n')
 
         for pair in deps:
@@ -245,6 +283,129 @@ class PackageDB(object):
         out.write('}\n')
 
 
+def _encoded(value):
+    """Encode a unicode string from JSON as a UTF-8 str, like the
+       class attribute it was read from.  Other values are unchanged."""
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    return value
+
+
+class PackageMetadata(object):
+    """Class-level information about a package: its homepage, url,
+       docstring, versions, dependencies, provided virtual packages and
+       patches.  These can be stored in the package metadata cache, so
+       they are available without importing the package file.
+
+       Strings read back from JSON are unicode; like Spec.from_node_dict(),
+       this converts them to str before they reach the spec and version
+       parse caches.
+    """
+    def __init__(self, name, data):
+        self.name = str(name)
+        self.homepage = _encoded(data['homepage'])
+        self.url = _encoded(data['url'])
+        self.doc = _encoded(data['doc'])
+        self.versions = [Version(str(v)) for v in data['versions']]
+        self.dependencies = dict(
+            (str(dep_name), spack.spec.Spec(str(dep)))
+            for dep_name, dep in data['dependencies'])
+        self.provided = dict(
+            (spack.spec.Spec(str(provided)), spack.spec.Spec(str(provider)))
+            for provided, provider in data['provided'])
+        self.patches = dict(
+            (spack.spec.Spec(str(when)),
+             [(str(path_or_url), level) for path_or_url, level in patches])
+            for when, patches in data['patches'])
+
+
+    @staticmethod
+    def data_from_class(cls):
+        """Read the metadata of a package class into a dict that can be
+           stored as JSON and passed to the constructor."""
+        return {
+            'homepage'     : getattr(cls, 'homepage', None),
+            'url'          : getattr(cls, 'url', None),
+            'doc'          : cls.__doc__,
+            'versions'     : [str(v) for v in sorted(cls.versions)],
+            'dependencies' : [(name, str(dep)) for name, dep
+                              in cls.dependencies.items()],
+            'provided'     : [(str(provided), str(provider)) for
+                              provided, provider in cls.provided.items()],
+            'patches'      : [(str(when), [(p.path_or_url, p.level)
+                                           for p in patches])
+                              for when, patches in cls.patches.items()] }
+
+
+class PackageMetadataCache(object):
+    """Stores PackageMetadata for the packages in a PackageDB in a JSON
+       file, one per PackageDB root.  Each entry records the mtime and
+       size of the package file it was read from, and only entries whose
+       package file changed are read again by importing the package.
+    """
+    _cache_version = 1
+
+    def __init__(self, db):
+        self.db = db
+        self._entries = None
+        self._dirty = False
+
+
+    @property
+    def path(self):
+        """Cache files are named after the package DB root, so that
+           each package DB has its own."""
+        root_hash = hashlib.sha1(os.path.abspath(self.db.root)).hexdigest()
+        return join_path(spack.cache_path, 'package_metadata',
+                         root_hash + '.json')
+
+
+    def _load(self):
+        if self._entries is None:
+            data = read_json_file(self.path, self._cache_version)
+            self._entries = data.get('packages', {}) if data else {}
+        return self._entries
+
+
+    def get(self, pkg_name):
+        """Get PackageMetadata for a package, importing it only if the
+           cached entry is missing or out of date.  New entries are
+           written out by save()."""
+        try:
+            stat = os.stat(self.db.filename_for_package_name(pkg_name))
+        except OSError:
+            raise UnknownPackageError(pkg_name)
+        stamp = [stat.st_mtime, stat.st_size]
+
+        entries = self._load()
+        entry = entries.get(pkg_name)
+        if entry is None or entry['stamp'] != stamp:
+            cls = self.db.get_class_for_package_name(pkg_name)
+            entry = { 'stamp'    : stamp,
+                      'metadata' : PackageMetadata.data_from_class(cls) }
+            entries[pkg_name] = entry
+            self._dirty = True
+        return PackageMetadata(pkg_name, entry['metadata'])
+
+
+    def prune(self, pkg_names):
+        """Drop entries for packages that are not in pkg_names."""
+        entries = self._load()
+        for name in set(entries).difference(pkg_names):
+            del entries[name]
+            self._dirty = True
+
+
+    def save(self):
+        """Write the cache out if it changed."""
+        if not self._dirty:
+            return
+
+        if write_json_file(self.path, { 'version'  : self._cache_version,
+                                        'packages' : self._entries }):
+            self._dirty = False
+
+
 class UnknownPackageError(spack.error.SpackError):
     """Raised when we encounter a package spack doesn't have."""
     def __init__(self, name):
@@ -49,13 +49,26 @@ class Token:
                    (other.type, other.value))
 
 
+def _token_action(type):
+    """Make a scanner action that produces tokens of the given type."""
+    if type is None:
+        return None
+    return lambda scanner, val: Token(
+        type, val, scanner.match.start(0), scanner.match.end(0))
+
+
 class Lexer(object):
-    """Base class for Lexers that keep track of line numbers."""
+    """Base class for Lexers that keep track of line numbers.
+
+       The lexicon is a list of (regex, token type) pairs.  Text matching
+       a regex whose token type is None is skipped.  The lexicon is
+       compiled once, when the lexer is created, and the lexer keeps no
+       state between calls to lex(), so lexers can be created once and
+       shared.
+    """
     def __init__(self, lexicon):
-        self.scanner = re.Scanner(lexicon)
-
-    def token(self, type, value=''):
-        return Token(type, value, self.scanner.match.start(0), self.scanner.match.end(0))
+        self.scanner = re.Scanner(
+            [(regex, _token_action(type)) for regex, type in lexicon])
 
     def lex(self, text):
         tokens, remainder = self.scanner.scan(text)
@@ -93,12 +93,14 @@ expansion when it is the first character in an id typed on the command line.
 import sys
 import itertools
 import hashlib
+import json
 from StringIO import StringIO
 from operator import attrgetter
 
 import llnl.util.tty as tty
 from llnl.util.lang import *
 from llnl.util.tty.color import *
+from external.ordereddict import OrderedDict
 
 import spack
 import spack.parse
@@ -135,6 +137,17 @@ _separators = '[%s]' % ''.join(color_formats.keys())
    every time we call str()"""
 _any_version = VersionList([':'])
 
+"""Spec strings that were parsed recently, and the specs parsed from
+   them, least recently used first; see _parse_cached()."""
+_parse_cache_size = 1024
+_parse_cache = OrderedDict()
+
+"""Legal values of traversal options, checked by Spec.traverse()."""
+_traversal_options = {
+    'cover'     : ('nodes', 'edges', 'paths'),
+    'direction' : ('children', 'parents'),
+    'order'     : ('pre', 'post') }
+
 
 def index_specs(specs):
     """Take a list of specs and return a dict of lists.  Dict is
@@ -251,6 +264,23 @@ class CompilerSpec(object):
         return clone
 
 
+    def to_dict(self):
+        """Return a dict of primitive types representing this compiler
+           spec.  See from_dict()."""
+        return { 'name'     : self.name,
+                 'versions' : str(self.versions) }
+
+
+    @staticmethod
+    def from_dict(d):
+        """Construct a CompilerSpec from the output of to_dict() without
+           running the spec parser."""
+        cspec = CompilerSpec.__new__(CompilerSpec)
+        cspec.name = str(d['name'])
+        cspec.versions = VersionList(str(d['versions']))
+        return cspec
+
+
     def _cmp_key(self):
         return (self.name, self.versions)
 
@@ -303,7 +333,58 @@ class VariantMap(HashableMap):
 
 class DependencyMap(HashableMap):
     """Each spec has a DependencyMap containing specs for its dependencies.
-       The DependencyMap is keyed by name. """
+       The DependencyMap is keyed by name.
+
+       A map that belongs to a spec tells it when it changes, so that
+       cached traversals that go through the spec are discarded; see
+       Spec._structure_changed().
+    """
+    def __init__(self, owner=None):
+        super(DependencyMap, self).__init__()
+        self.owner = owner
+
+
+    def _changed(self):
+        if self.owner is not None:
+            self.owner._structure_changed()
+
+
+    def __setitem__(self, key, value):
+        self._changed()
+        super(DependencyMap, self).__setitem__(key, value)
+
+
+    def __delitem__(self, key):
+        self._changed()
+        super(DependencyMap, self).__delitem__(key)
+
+
+    def clear(self):
+        self._changed()
+        super(DependencyMap, self).clear()
+
+
+    def pop(self, *args):
+        self._changed()
+        return super(DependencyMap, self).pop(*args)
+
+
+    def popitem(self):
+        self._changed()
+        return super(DependencyMap, self).popitem()
+
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self._changed()
+        return super(DependencyMap, self).setdefault(key, default)
+
+
+    def update(self, *args, **kwargs):
+        self._changed()
+        super(DependencyMap, self).update(*args, **kwargs)
+
+
     @property
     def concrete(self):
         return all(d.concrete for d in self.values())
@@ -326,24 +407,15 @@ class Spec(object):
         if not isinstance(spec_like, basestring):
             raise TypeError("Can't make spec out of %s" % type(spec_like))
 
-        spec_list = SpecParser().parse(spec_like)
+        spec_list = _parse_cached(spec_like)
         if len(spec_list) > 1:
             raise ValueError("More than one spec in string: " + spec_like)
         if len(spec_list) < 1:
             raise ValueError("String contains no specs: " + spec_like)
 
-        # Take all the attributes from the first parsed spec without copying.
-        # This is safe b/c we throw out the parsed spec.  It's a bit nasty,
-        # but it's nastier to implement the constructor so that the parser
-        # writes directly into this Spec object.
-        other = spec_list[0]
-        self.name = other.name
-        self.dependents = other.dependents
-        self.versions = other.versions
-        self.variants = other.variants
-        self.architecture = other.architecture
-        self.compiler = other.compiler
-        self.dependencies = other.dependencies
+        # Parsed specs are shared through the parse cache, so copy the
+        # first one into this Spec object.
+        self._dup(spec_list[0])
 
         # Specs are by default not assumed to be normal, but in some
         # cases we've read them from a file want to assume normal.
@@ -352,6 +424,10 @@ class Spec(object):
         self._normal = kwargs.get('normal', False)
         self._concrete = kwargs.get('concrete', False)
 
+        # Concrete specs read from install prefixes may defer
+        # normalization until package information is actually needed.
+        self._lazy_normal = kwargs.get('lazy_normal', False)
+
         # This allows users to construct a spec DAG with literals.
         # Note that given two specs a and b, Spec(a) copies a, but
         # Spec(a, b) will copy a but just add b as a dep.
@@ -393,6 +469,7 @@ class Spec(object):
         """Called by the parser to add another spec as a dependency."""
         if spec.name in self.dependencies:
             raise DuplicateDependencyError("Cannot depend on '%s' twice" % spec)
+        self._invalidate_hashes()
         self.dependencies[spec.name] = spec
         spec.dependents[self.name] = self
 
@@ -418,6 +495,8 @@ class Spec(object):
 
     @property
     def package(self):
+        if self._lazy_normal:
+            self.normalize()
         return spack.db.get(self)
 
 
@@ -491,6 +570,10 @@ class Spec(object):
                If 'children', does a traversal of this spec's children.  If
                'parents', traverses upwards in the DAG towards the root.
 
+           The traversal uses an explicit stack rather than recursion.
+           Node and edge traversals are computed once and cached
+           until this DAG changes structure, so the DAG
+           should not be restructured while they are being iterated.
         """
         # get initial values for kwargs
         depth      = kwargs.get('depth', False)
@@ -503,46 +586,72 @@ class Spec(object):
         order      = kwargs.get('order', 'pre')
 
         # Make sure kwargs have legal values; raise ValueError if not.
-        def validate(name, val, allowed_values):
+        for name, val in (('cover', cover), ('direction', direction),
+                          ('order', order)):
+            allowed_values = _traversal_options[name]
             if val not in allowed_values:
                 raise ValueError("Invalid value for %s: %s.  Choices are %s"
                                  % (name, val, ",".join(allowed_values)))
-        validate('cover',     cover,     ('nodes', 'edges', 'paths'))
-        validate('direction', direction, ('children', 'parents'))
-        validate('order',     order,     ('pre', 'post'))
-
-        if visited is None:
-            visited = set()
-        key = key_fun(self)
 
-        # Node traversal does not yield visited nodes.
-        if key in visited and cover == 'nodes':
-            return
-
-        # Determine whether and what to yield for this node.
-        yield_me = yield_root or d > 0
-        result = (d, self) if depth else self
+        # Fresh node and edge traversals are cached.
+        cacheable = (visited is None and d == 0
+                     and 'key' not in kwargs and cover != 'paths')
+        if cacheable:
+            order_key = (order, cover, direction)
+            nodes = self._cached_orders.get(order_key)
+            if nodes is None:
+                nodes = list(self._traverse_nodes(
+                    set(), 0, id, cover, direction, order))
+                self._cached_orders[order_key] = nodes
+                for node_depth, node in nodes:
+                    node._cache_refs += 1
+        else:
+            if visited is None:
+                visited = set()
+            nodes = self._traverse_nodes(
+                visited, d, key_fun, cover, direction, order)
+
+        for node_depth, node in nodes:
+            if yield_root or node_depth > 0:
+                yield (node_depth, node) if depth else node
+
+
+    def _traverse_nodes(self, visited, d, key_fun, cover, direction, order):
+        """Iterative helper for traverse().  Yields (depth, node) tuples
+           for every node, including the root, in traversal order."""
+        # Each stack entry is (depth, node, entered).  Nodes are entered
+        # when popped; postorder nodes are pushed back, already entered,
+        # underneath their successors, and yielded when popped again.
+        stack = [(d, self, False)]
+        while stack:
+            node_depth, node, entered = stack.pop()
+            if entered:
+                yield node_depth, node
+                continue
+
+            key = key_fun(node)
+
+            # Node traversal does not yield visited nodes.
+            if key in visited and cover == 'nodes':
+                continue
+
+            # Preorder traversal yields before successors
+            if order == 'pre':
+                yield node_depth, node
+            else:
+                stack.append((node_depth, node, True))
 
-        # Preorder traversal yields before successors
-        if yield_me and order == 'pre':
-            yield result
+            # Edge traversal yields but skips children of visited nodes
+            if key in visited and cover == 'edges':
+                continue
 
-        # Edge traversal yields but skips children of visited nodes
-        if not (key in visited and cover == 'edges'):
-            # This code determines direction and yields the children/parents
-            successors = self.dependencies
+            successors = node.dependencies
             if direction == 'parents':
-                successors = self.dependents
+                successors = node.dependents
 
             visited.add(key)
-            for name in sorted(successors):
-                child = successors[name]
-                for elt in child.traverse(visited, d+1, **kwargs):
-                    yield elt
-
-        # Postorder traversal yields after successors
-        if yield_me and order == 'post':
-            yield result
+            for name in sorted(successors, reverse=True):
+                stack.append((node_depth + 1, successors[name], False))
 
 
     @property
@@ -563,15 +672,94 @@ class Spec(object):
 
            If you want this hash to be consistent, you should
            concretize the spec first so that it is not ambiguous.
+           Hashes of concrete specs are computed once and cached.
+        """
+        if self._cached_hash is None:
+            sha = hashlib.sha1()
+            sha.update(self.dep_string())
+            full_hash = sha.hexdigest()
+            if not self.concrete:
+                return full_hash[:length]
+            self._cached_hash = full_hash
+
+        return self._cached_hash[:length]
+
+
+    def _dep_closure(self):
+        """Return a dict mapping the name of every dependency of this
+           concrete spec (direct and indirect) to its node.
+
+           Each node's closure is built from its children's closures
+           and cached, so hashing a whole concrete DAG touches each node
+           once.
         """
-        sha = hashlib.sha1()
-        sha.update(self.dep_string())
-        full_hash = sha.hexdigest()
+        if self._cached_closure is None:
+            closure = {}
+            for dep in self.dependencies.values():
+                closure.update(dep._dep_closure())
+                closure[dep.name] = dep
+            self._cached_closure = closure
+        return self._cached_closure
+
+
+    def _invalidate_hashes(self):
+        """Clear cached hashes on this spec and on all specs that depend
+           on it.  Call this whenever a spec's DAG changes.  Raises
+           FrozenSpecError if this spec is frozen."""
+        if self._frozen:
+            raise FrozenSpecError(self)
+
+        if self._cached_closure is None and self._cached_hash is None:
+            return
+
+        self._cached_closure = None
+        self._cached_hash = None
+        for dependent in self.dependents.values():
+            dependent._invalidate_hashes()
+
 
-        return full_hash[:length]
+    def _structure_changed(self):
+        """Discard cached traversals and indexes that can include this
+           spec.  Its DependencyMaps call this before they change.
+           Traversals from its ancestors reach it going
+           down, and traversals from its descendants reach it going up,
+           so only caches in this spec's own DAG are affected.
 
+           Each node counts the cached traversals it appears in.  Every
+           node on a path from a cache's owner to this spec is in that
+           cache, so the search stops at nodes that are in none.  While
+           a DAG is being built nothing is cached, and adding an edge
+           does not search at all.
+        """
+        if not self._cache_refs:
+            return
 
-    def _concretize_helper(self, presets=None, visited=None):
+        for direction in ('dependents', 'dependencies'):
+            visited = set()
+            stack = [self]
+            while stack:
+                spec = stack.pop()
+                if id(spec) in visited:
+                    continue
+                visited.add(id(spec))
+
+                spec._clear_structure_caches()
+                stack.extend(s for s in getattr(spec, direction).values()
+                             if s._cache_refs)
+
+
+    def _clear_structure_caches(self):
+        """Discard this spec's cached traversals and the indexes built
+           from them."""
+        for nodes in self._cached_orders.values():
+            for node_depth, node in nodes:
+                node._cache_refs -= 1
+        self._cached_orders = {}
+        self._cached_names = None
+        self._cached_providers = None
+
+
+    def _concretize_helper(self, concretizer, presets=None, visited=None):
         """Recursive helper function for concretize().
            This concretizes everything bottom-up.  As things are
            concretized, they're added to the presets, and ancestors
@@ -585,7 +773,8 @@ class Spec(object):
 
         # Concretize deps first -- this is a bottom-up process.
         for name in sorted(self.dependencies.keys()):
-            self.dependencies[name]._concretize_helper(presets, visited)
+            self.dependencies[name]._concretize_helper(
+                concretizer, presets, visited)
 
         if self.name in presets:
             self.constrain(presets[self.name])
@@ -594,9 +783,9 @@ class Spec(object):
             # to presets below, their constraints will all be merged, but we'll
             # still need to select a concrete package later.
             if not self.virtual:
-                spack.concretizer.concretize_architecture(self)
-                spack.concretizer.concretize_compiler(self)
-                spack.concretizer.concretize_version(self)
+                concretizer.concretize_architecture(self)
+                concretizer.concretize_compiler(self)
+                concretizer.concretize_version(self)
             presets[self.name] = self
 
         visited.add(self.name)
@@ -607,14 +796,20 @@ class Spec(object):
         assert(self.virtual)
         for name, dependent in self.dependents.items():
             del dependent.dependencies[self.name]
-            dependent._add_dependency(concrete)
+            if dependent.dependencies.get(concrete.name) is not concrete:
+                dependent._add_dependency(concrete)
 
 
-    def _expand_virtual_packages(self):
+    def _expand_virtual_packages(self, concretizer):
         """Find virtual packages in this spec, replace them with providers,
-           and normalize again to include the provider's (potentially virtual)
+           and normalize the providers to include their (potentially virtual)
            dependencies.  Repeat until there are no virtual deps.
 
+           Only the nodes that a new provider brings into the DAG are
+           normalized; they are merged with the nodes already there just
+           as normalize() would merge them.  Virtual packages that they
+           expose are queued and expanded in turn.
+
            Precondition: spec is normalized.
 
            .. todo::
@@ -627,23 +822,46 @@ class Spec(object):
               this are infrequent, but should implement this before it is
               a problem.
         """
-        while True:
-            virtuals =[v for v in self.traverse() if v.virtual]
-            if not virtuals:
-                return
-
-            for spec in virtuals:
-                providers = spack.db.providers_for(spec)
-                concrete = spack.concretizer.choose_provider(spec, providers)
-                concrete = concrete.copy()
-                spec._replace_with(concrete)
-
-            # If there are duplicate providers or duplicate provider deps, this
-            # consolidates them and merge constraints.
-            self.normalize(force=True)
-
-
-    def concretize(self):
+        spec_deps = dict(self._name_index()[0])
+        index = ProviderIndex(spec_deps.values(), restrict=True)
+        visited = set(spec_deps)
+
+        queue = [v for v in self.traverse() if v.virtual]
+        while queue:
+            spec = queue.pop(0)
+            if spec_deps.get(spec.name) is not spec:
+                # Already replaced by a provider introduced earlier.
+                continue
+
+            providers = spack.db.providers_for(spec)
+            concrete = concretizer.choose_provider(spec, providers)
+            del spec_deps[spec.name]
+
+            if concrete.name in spec_deps:
+                # The provider is already in the DAG; merge constraints.
+                provider = spec_deps[concrete.name]
+                try:
+                    provider.constrain(concrete, deps=False)
+                except UnsatisfiableSpecError, e:
+                    raise InconsistentSpecError(
+                        "Invalid Spec DAG: %s" % e.message)
+                spec._replace_with(provider)
+                continue
+
+            provider = concrete.copy()
+            spec._replace_with(provider)
+            spec_deps[provider.name] = provider
+            index.update(provider)
+
+            # Normalize the new provider's dependencies into the DAG
+            # and queue any virtual packages this exposes.
+            known = set(spec_deps)
+            provider._normalize_helper(visited, spec_deps, index)
+            queue.extend(spec_deps[name] for name in sorted(spec_deps)
+                         if name not in known and spec_deps[name].virtual)
+
+
+    def concretize(self, concretizer=None):
         """A spec is concrete if it describes one build of a package uniquely.
            This will ensure that this spec is concrete.
 
@@ -654,22 +872,28 @@ class Spec(object):
            Concretizing ensures that it is self-consistent and that it's consistent
            with requirements of its pacakges.  See flatten() and normalize() for
            more details on this.
+
+           Choices are made by spack.concretizer, unless another
+           concretizer is supplied.
         """
         if self._concrete:
             return
 
+        if concretizer is None:
+            concretizer = spack.concretizer
+
         self.normalize()
-        self._expand_virtual_packages()
-        self._concretize_helper()
+        self._expand_virtual_packages(concretizer)
+        self._concretize_helper(concretizer)
         self._concrete = True
 
 
-    def concretized(self):
+    def concretized(self, concretizer=None):
         """This is a non-destructive version of concretize().  First clones,
            then returns a concrete version of this package without modifying
            this package. """
         clone = self.copy()
-        clone.concretize()
+        clone.concretize(concretizer)
         return clone
 
 
@@ -697,7 +921,9 @@ class Spec(object):
                     flat_deps[spec.name].constrain(spec)
 
             if not copy:
+                self._invalidate_hashes()
                 for dep in flat_deps.values():
+                    dep._invalidate_hashes()
                     dep.dependencies.clear()
                     dep.dependents.clear()
                 self.dependencies.clear()
@@ -762,17 +988,15 @@ class Spec(object):
             else:
                 # if it's a real dependency, check whether it provides something
                 # already required in the spec.
-                index = ProviderIndex([pkg_dep], restrict=True)
+                provider_index.update(pkg_dep)
                 for vspec in (v for v in spec_deps.values() if v.virtual):
-                    if index.providers_for(vspec):
-                        vspec._replace_with(pkg_dep)
+                    if provider_index.provides(pkg_dep, vspec):
+                        if name not in spec_deps:
+                            spec_deps[name] = pkg_dep.copy()
+                        vspec._replace_with(spec_deps[name])
                         del spec_deps[vspec.name]
-                    else:
-                        required = index.providers_for(vspec.name)
-                        if required:
-                            raise UnsatisfiableProviderSpecError(
-                                required[0], pkg_dep)
-                provider_index.update(pkg_dep)
+                    elif provider_index.provides(pkg_dep, vspec.name):
+                        raise UnsatisfiableProviderSpecError(vspec, pkg_dep)
 
             if name not in spec_deps:
                 # If the spec doesn't reference a dependency that this package
@@ -816,6 +1040,7 @@ class Spec(object):
         """
         if self._normal and not kwargs.get('force', False):
             return
+        self._lazy_normal = False
 
         # Ensure first that all packages & compilers in the DAG exist.
         self.validate_names()
@@ -829,8 +1054,6 @@ class Spec(object):
 
         # Figure out which of the user-provided deps provide virtual deps.
         # Remove virtual deps that are already provided by something in the spec
-        spec_packages = [d.package for d in spec_deps.values() if not d.virtual]
-
         index = ProviderIndex(spec_deps.values(), restrict=True)
 
         visited = set()
@@ -899,6 +1122,7 @@ class Spec(object):
                 raise UnsatisfiableArchitectureSpecError(self.architecture,
                                                          other.architecture)
 
+        self._invalidate_hashes()
         if self.compiler is not None and other.compiler is not None:
             self.compiler.constrain(other.compiler)
         elif self.compiler is None:
@@ -934,19 +1158,44 @@ class Spec(object):
 
     def common_dependencies(self, other):
         """Return names of dependencies that self an other have in common."""
-        common = set(
-            s.name for s in self.traverse(root=False))
-        common.intersection_update(
-            s.name for s in other.traverse(root=False))
-        return common
+        return self._name_index()[1] & other._name_index()[1]
 
 
     def dep_difference(self, other):
         """Returns dependencies in self that are not in other."""
-        mine = set(s.name for s in self.traverse(root=False))
-        mine.difference_update(
-            s.name for s in other.traverse(root=False))
-        return mine
+        return self._name_index()[1] - other._name_index()[1]
+
+
+    def _name_index(self):
+        """Return a dict mapping names to the first node with that name
+           in a preorder traversal of this spec's DAG, and the set of
+           names of this spec's dependencies.  Both are built once and
+           reused until this DAG changes structure.
+        """
+        if self._cached_names is None:
+            nodes = {}
+            dep_names = set()
+            for d, spec in self.traverse(depth=True):
+                nodes.setdefault(spec.name, spec)
+                if d > 0:
+                    dep_names.add(spec.name)
+            self._cached_names = (nodes, dep_names)
+        return self._cached_names
+
+
+    def _provider_index(self):
+        """Return a ProviderIndex over the nodes of this spec's DAG.
+           Nodes of concrete specs no longer change, so for them the
+           index is built once and reused until this DAG changes
+           structure.
+        """
+        if not self.concrete:
+            return ProviderIndex(self.traverse(), restrict=True)
+
+        if self._cached_providers is None:
+            self._cached_providers = ProviderIndex(
+                self.traverse(), restrict=True)
+        return self._cached_providers
 
 
     def _autospec(self, spec_like):
@@ -1004,8 +1253,8 @@ class Spec(object):
                 return False
 
         # For virtual dependencies, we need to dig a little deeper.
-        self_index = ProviderIndex(self.traverse(), restrict=True)
-        other_index = ProviderIndex(other.traverse(), restrict=True)
+        self_index = self._provider_index()
+        other_index = other._provider_index()
 
         # This handles cases where there are already providers for both vpkgs
         if not self_index.satisfies(other_index):
@@ -1030,6 +1279,28 @@ class Spec(object):
         return [spec for spec in self.traverse() if spec.virtual]
 
 
+    def _init_caches(self):
+        """Set up a new spec node with no deferred normalization and
+           empty caches.  Every way of building a Spec node calls this,
+           so new caches only need to be initialized here."""
+        self._lazy_normal = False
+
+        # Hashes of concrete specs are cached; see dep_hash().
+        self._cached_closure = None
+        self._cached_hash = None
+
+        # Comparison keys of frozen specs are cached; see freeze().
+        self._frozen = False
+        self._cached_key = None
+        self._cached_key_hash = None
+
+        # Traversal orders and name lookups are cached; see traverse().
+        self._cached_orders = {}
+        self._cached_names = None
+        self._cached_providers = None
+        self._cache_refs = 0
+
+
     def _dup(self, other, **kwargs):
         """Copy the spec other into self.  This is an overwriting
            copy.  It does not copy any dependents (parents), but by default
@@ -1048,8 +1319,10 @@ class Spec(object):
         self.variants = other.variants.copy()
         self.architecture = other.architecture
         self.compiler = other.compiler.copy() if other.compiler else None
-        self.dependents = DependencyMap()
-        self.dependencies = DependencyMap()
+        self.dependents = DependencyMap(self)
+        self.dependencies = DependencyMap(self)
+
+        self._init_caches()
 
         # If we copy dependencies, preserve DAG structure in the new spec
         if kwargs.get('deps', True):
@@ -1062,11 +1335,29 @@ class Spec(object):
                 parent = new_nodes[spec.name]
                 for child in spec.dependencies:
                     if child not in parent.dependencies:
-                        parent._add_dependency(new_nodes[child])
+                        # All of these nodes are new, so there are no
+                        # cached traversals to discard.
+                        dict.__setitem__(
+                            parent.dependencies, child, new_nodes[child])
+                        dict.__setitem__(
+                            new_nodes[child].dependents, parent.name, parent)
+
+            # Nodes of concrete specs are unique by name, and the copy has
+            # the same structure, so cached hashes are still valid.
+            # Closures refer to nodes, so they point at the new ones.
+            if other._concrete:
+                for spec in other.traverse(cover='nodes'):
+                    copy = new_nodes[spec.name]
+                    copy._cached_hash = spec._cached_hash
+                    if spec._cached_closure is not None:
+                        copy._cached_closure = dict(
+                            (name, new_nodes[name])
+                            for name in spec._cached_closure)
 
         # Since we preserved structure, we can copy _normal safely.
         self._normal = other._normal
         self._concrete = other._concrete
+        self._lazy_normal = other._lazy_normal
 
 
     def copy(self, **kwargs):
@@ -1088,9 +1379,9 @@ class Spec(object):
 
     def __getitem__(self, name):
         """TODO: reconcile __getitem__, _add_dependency, __contains__"""
-        for spec in self.traverse():
-            if spec.name == name:
-                return spec
+        nodes = self._name_index()[0]
+        if name in nodes:
+            return nodes[name]
 
         raise KeyError("No spec with name %s in %s" % (name, self))
 
@@ -1136,6 +1427,13 @@ class Spec(object):
             # Skip visited nodes
             if visited_s or visited_o: continue
 
+            # Shared sub-DAGs are trivially equal.
+            if s is o:
+                for node in s.traverse():
+                    vs.add(id(node))
+                    vo.add(id(node))
+                continue
+
             # Recursive check for equality
             if not s._eq_dag(o, vs, vo):
                 return False
@@ -1145,6 +1443,13 @@ class Spec(object):
 
     def eq_dag(self, other):
         """True if the full dependency DAGs of specs are equal"""
+        if self is other:
+            return True
+
+        # Frozen specs have cached hashes, which make a cheap first check.
+        if self._frozen and other._frozen and hash(self) != hash(other):
+            return False
+
         return self._eq_dag(other, set(), set())
 
 
@@ -1173,8 +1478,49 @@ class Spec(object):
         """Comparison key for this node and all dependencies *without*
            considering structure.  This is the default, as
            normalization will restore structure.
+
+           Dependencies are represented by their node keys.  Concrete
+           specs take them from the cached dependency closure instead
+           of merging copies of the DAG, and frozen specs compute the
+           whole key only once.
         """
-        return self._cmp_node() + (self.sorted_deps(),)
+        if self._cached_key is not None:
+            return self._cached_key
+
+        if self._concrete:
+            closure = self._dep_closure()
+            deps = tuple(closure[name]._cmp_node() for name in sorted(closure))
+        else:
+            deps = tuple(dep._cmp_node() for dep in self.sorted_deps())
+        key = self._cmp_node() + (deps,)
+
+        if self._frozen:
+            self._cached_key = key
+        return key
+
+
+    def __hash__(self):
+        if not self._frozen:
+            return hash(self._cmp_key())
+
+        if self._cached_key_hash is None:
+            self._cached_key_hash = hash(self._cmp_key())
+        return self._cached_key_hash
+
+
+    def freeze(self):
+        """Mark this concrete spec DAG as immutable.  Frozen specs
+           compute their comparison keys and hashes once, which makes
+           them cheap to compare and to use as dict keys.  Changing the
+           DAG of a frozen spec raises FrozenSpecError.  Copies of a
+           frozen spec are not frozen.  Returns this spec.
+        """
+        if not self.concrete:
+            raise SpecError("Only concrete specs can be frozen: %s" % self)
+
+        for spec in self.traverse():
+            spec._frozen = True
+        return self
 
 
     def colorized(self):
@@ -1278,6 +1624,10 @@ class Spec(object):
 
 
     def dep_string(self):
+        if self.concrete:
+            closure = self._dep_closure()
+            return ''.join("^" + closure[name].format()
+                           for name in sorted(closure))
         return ''.join("^" + dep.format() for dep in self.sorted_deps())
 
 
@@ -1314,6 +1664,90 @@ class Spec(object):
         return out
 
 
+    def to_node_dict(self):
+        """Return a dict of primitive types describing just this node of
+           the spec.  Dependencies are recorded by name."""
+        d = { 'versions'     : str(self.versions),
+              'arch'         : self.architecture,
+              'compiler'     : None,
+              'variants'     : dict((name, v.enabled)
+                                    for name, v in self.variants.items()),
+              'dependencies' : sorted(self.dependencies) }
+        if self.compiler:
+            d['compiler'] = self.compiler.to_dict()
+        if self.concrete:
+            d['hash'] = self.dep_hash()
+        return { self.name : d }
+
+
+    def to_dict(self):
+        """Return a dict of primitive types representing the whole spec
+           DAG.  The root node comes first, followed by its dependencies
+           in preorder.  This is suitable for serializing with json."""
+        return { 'spec' : [s.to_node_dict() for s in self.traverse()] }
+
+
+    def to_json(self):
+        """Return a JSON string representing this spec DAG."""
+        return json.dumps(self.to_dict(), sort_keys=True, indent=1)
+
+
+    @staticmethod
+    def from_node_dict(node):
+        """Construct a single spec node, without dependencies, from the
+           output of to_node_dict().  This does not run the spec parser."""
+        name = next(iter(node))
+        d = node[name]
+
+        spec = Spec.__new__(Spec)
+        spec.name = str(name)
+        spec.versions = VersionList(str(d['versions']))
+        spec.variants = VariantMap()
+        for vname, enabled in d['variants'].items():
+            spec.variants[str(vname)] = Variant(str(vname), enabled)
+        spec.architecture = str(d['arch']) if d['arch'] else None
+        spec.compiler = None
+        if d['compiler']:
+            spec.compiler = CompilerSpec.from_dict(d['compiler'])
+        spec.dependents   = DependencyMap(spec)
+        spec.dependencies = DependencyMap(spec)
+
+        spec._normal = False
+        spec._concrete = False
+        spec._init_caches()
+        if 'hash' in d:
+            spec._cached_hash = str(d['hash'])
+        return spec
+
+
+    @staticmethod
+    def from_dict(data):
+        """Construct a spec DAG from the output of to_dict().  Nodes are
+           built directly; nothing is parsed and no packages are loaded.
+           Returns the root of the DAG."""
+        nodes = data['spec']
+        specs = {}
+        for node in nodes:
+            spec = Spec.from_node_dict(node)
+            specs[spec.name] = spec
+
+        for node in nodes:
+            name = next(iter(node))
+            for dep_name in node[name]['dependencies']:
+                specs[str(name)]._add_dependency(specs[str(dep_name)])
+
+        return specs[str(next(iter(nodes[0])))]
+
+
+    @staticmethod
+    def from_json(string):
+        """Construct a spec DAG from a JSON string made by to_json()."""
+        try:
+            return Spec.from_dict(json.loads(string))
+        except (ValueError, KeyError, TypeError, IndexError), e:
+            raise SpecJSONError("Error parsing JSON spec", e)
+
+
     def __repr__(self):
         return str(self)
 
@@ -1327,22 +1761,25 @@ class SpecLexer(spack.parse.Lexer):
     """Parses tokens that make up spack specs."""
     def __init__(self):
         super(SpecLexer, self).__init__([
-            (r'\^',        lambda scanner, val: self.token(DEP,   val)),
-            (r'\@',        lambda scanner, val: self.token(AT,    val)),
-            (r'\:',        lambda scanner, val: self.token(COLON, val)),
-            (r'\,',        lambda scanner, val: self.token(COMMA, val)),
-            (r'\+',        lambda scanner, val: self.token(ON,    val)),
-            (r'\-',        lambda scanner, val: self.token(OFF,   val)),
-            (r'\~',        lambda scanner, val: self.token(OFF,   val)),
-            (r'\%',        lambda scanner, val: self.token(PCT,   val)),
-            (r'\=',        lambda scanner, val: self.token(EQ,    val)),
-            (r'\w[\w.-]*', lambda scanner, val: self.token(ID,    val)),
-            (r'\s+',       lambda scanner, val: None)])
+            (r'\^',        DEP),
+            (r'\@',        AT),
+            (r'\:',        COLON),
+            (r'\,',        COMMA),
+            (r'\+',        ON),
+            (r'\-',        OFF),
+            (r'\~',        OFF),
+            (r'\%',        PCT),
+            (r'\=',        EQ),
+            (r'\w[\w.-]*', ID),
+            (r'\s+',       None)])
+
+"""Lexers are stateless, so all spec parsers share one."""
+_lexer = SpecLexer()
 
 
 class SpecParser(spack.parse.Parser):
     def __init__(self):
-        super(SpecParser, self).__init__(SpecLexer())
+        super(SpecParser, self).__init__(_lexer)
 
 
     def do_parse(self):
@@ -1384,11 +1821,12 @@ class SpecParser(spack.parse.Parser):
         spec.variants = VariantMap()
         spec.architecture = None
         spec.compiler = None
-        spec.dependents   = DependencyMap()
-        spec.dependencies = DependencyMap()
+        spec.dependents   = DependencyMap(spec)
+        spec.dependencies = DependencyMap(spec)
 
         spec._normal = False
         spec._concrete = False
+        spec._init_caches()
 
         # record this so that we know whether version is
         # unspecified or not.
@@ -1492,7 +1930,31 @@ def parse(string):
     """Returns a list of specs from an input string.
        For creating one spec, see Spec() constructor.
     """
-    return SpecParser().parse(string)
+    return [spec.copy() for spec in _parse_cached(string)]
+
+
+def _parse_cached(string):
+    """Returns the list of specs parsed from a string, reusing the result
+       if the string was parsed recently.  Strings that fail to parse
+       raise the same error again.  The returned specs are shared, so
+       callers must copy them before handing them out.
+    """
+    if string in _parse_cache:
+        result = _parse_cache.pop(string)
+    else:
+        try:
+            result = SpecParser().parse(string)
+        except (SpecError, spack.parse.ParseError), e:
+            result = e
+
+        if len(_parse_cache) >= _parse_cache_size:
+            _parse_cache.popitem(last=False)
+
+    # Most recently used strings go to the end of the cache.
+    _parse_cache[string] = result
+    if isinstance(result, Exception):
+        raise result
+    return result
 
 
 def parse_anonymous_spec(spec_like, pkg_name):
@@ -1529,6 +1991,19 @@ class SpecError(spack.error.SpackError):
         super(SpecError, self).__init__(message)
 
 
+class SpecJSONError(SpecError):
+    """Raised when a JSON spec can't be read."""
+    def __init__(self, message, error):
+        super(SpecJSONError, self).__init__("%s: %s" % (message, error))
+
+
+class FrozenSpecError(SpecError):
+    """Raised when something tries to modify a frozen spec."""
+    def __init__(self, spec):
+        super(FrozenSpecError, self).__init__(
+            "Cannot modify frozen spec: %s" % spec.format())
+
+
 class SpecParseError(SpecError):
     """Wrapper for ParseError for when we're parsing specs."""
     def __init__(self, parse_error):
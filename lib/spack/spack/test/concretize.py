@@ -23,9 +23,16 @@
 # Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
 ##############################################################################
 import unittest
+import json
+import shutil
+import tempfile
 
 import spack
+import spack.config
+import spack.compilers
 from spack.spec import Spec, CompilerSpec
+from spack.concretize import *
+from spack.directory_layout import SpecHashDirectoryLayout
 from spack.test.mock_packages_test import *
 
 class ConcretizeTest(MockPackagesTest):
@@ -60,6 +67,14 @@ class ConcretizeTest(MockPackagesTest):
         self.check_concretize('libelf@0.8.13')
 
 
+    def test_concretize_folds_prefix_versions(self):
+        # mpich has 3.0 and 3.0.1 through 3.0.4.  available_versions
+        # folds these into 3.0, which is what concretization picks.
+        self.assertEqual(Spec('mpich').concretized().version, Version('3.0'))
+        self.assertEqual(Spec('mpich@3.0.2').concretized().version,
+                         Version('3.0.2'))
+
+
     def test_concretize_dag(self):
         self.check_concretize('callpath')
         self.check_concretize('mpileaks')
@@ -159,6 +174,17 @@ class ConcretizeTest(MockPackagesTest):
         self.assertFalse('mpi' in spec)
 
 
+    def test_virtual_expansion_is_normal(self):
+        # Expanding virtuals only normalizes the new providers; the
+        # result must be the same as normalizing the whole DAG.
+        for name in ('mpileaks ^zmpi', 'mpileaks ^mpi@:1', 'indirect_mpich'):
+            spec = Spec(name)
+            spec.concretize()
+            renormalized = spec.copy()
+            renormalized.normalize(force=True)
+            self.assertTrue(spec.eq_dag(renormalized))
+
+
     def test_my_dep_depends_on_provider_of_my_virtual_dep(self):
         spec = Spec('indirect_mpich')
         spec.normalize()
@@ -175,3 +201,139 @@ class ConcretizeTest(MockPackagesTest):
         # TODO: not exactly the syntax I would like.
         self.assertTrue(spec['libdwarf'].compiler.satisfies('clang'))
         self.assertTrue(spec['libelf'].compiler.satisfies('clang'))
+
+
+    def test_compiler_registry(self):
+        spack.config.get_config(refresh=True)
+        self.assertEqual(
+            sorted(spack.compilers.all_compilers()),
+            [CompilerSpec('clang@3.3'), CompilerSpec('gcc@4.5.0')])
+
+        self.assertEqual([CompilerSpec('gcc@4.5.0')],
+                         spack.compilers.find('gcc'))
+        self.assertEqual([], spack.compilers.find('gcc@4.6:'))
+        self.assertEqual([], spack.compilers.find('intel'))
+
+        clang = spack.compilers.compiler_for_spec('clang@3.3')
+        self.assertEqual(CompilerSpec('clang@3.3'), clang.spec)
+        self.assertTrue(clang is spack.compilers.compiler_for_spec('clang@3.3'))
+
+        # Reloading the configuration rebuilds the registry.
+        spack.config.get_config(refresh=True)
+        self.assertFalse(clang is spack.compilers.compiler_for_spec('clang@3.3'))
+
+
+    def test_prefer_installed(self):
+        install_dir = tempfile.mkdtemp()
+        real_layout = spack.install_layout
+        real_concretizer = spack.concretizer
+        try:
+            layout = SpecHashDirectoryLayout(install_dir)
+            spack.install_layout = layout
+
+            installed = Spec('mpileaks%clang ^mpich2@1.3 ^libelf@0.8.12')
+            installed.concretize()
+            for spec in installed.traverse():
+                layout.make_path_for_spec(spec)
+
+            # By default, the installed configuration is not reused.
+            libdwarf = Spec('libdwarf').concretized()
+            self.assertFalse(libdwarf.compiler.satisfies('clang'))
+
+            spack.concretizer = DefaultConcretizer(prefer_installed=True)
+            for name in ('libdwarf', 'callpath', 'mpileaks'):
+                concrete = Spec(name).concretized()
+                self.assertEqual(layout.path_for_spec(installed[name]),
+                                 layout.path_for_spec(concrete))
+
+            # Constraints that installs don't satisfy are still honored.
+            libelf = Spec('libelf@0.8.13').concretized()
+            self.assertEqual('0.8.13', str(libelf.version))
+            self.assertTrue('mpich' in Spec('callpath ^mpich').concretized())
+
+        finally:
+            spack.install_layout = real_layout
+            spack.concretizer = real_concretizer
+            shutil.rmtree(install_dir)
+
+
+    def test_concretize_specs(self):
+        specs = [Spec('mpileaks'), Spec('callpath ^mpich'),
+                 Spec('mpileaks'), Spec('libelf')]
+        concretizer = spack.concretizer
+        concrete = concretize_specs(specs)
+
+        self.assertTrue(spack.concretizer is concretizer)
+        self.assertEqual(4, len(concrete))
+        self.assertTrue(all(s.concrete for s in concrete))
+        self.assertFalse(any(s.concrete for s in specs))
+
+        # Identical specs share one result.
+        self.assertTrue(concrete[0] is concrete[2])
+
+        for spec, result in zip(specs, concrete):
+            self.assertEqual(spec.name, result.name)
+            self.assertTrue(result.eq_dag(spec.concretized()))
+
+        # Shared subproblems get the same answer in every spec.
+        self.assertEqual(concrete[0]['libelf'], concrete[3])
+
+
+    def test_batch_provider_choice_depends_on_providers(self):
+        batch = BatchConcretizer(spack.concretizer)
+        mpi = Spec('mpi')
+        providers = spack.db.providers_for(mpi)
+        first = batch.choose_provider(mpi, providers)
+        others = [p for p in providers if p.name != first.name]
+        second = batch.choose_provider(mpi, others)
+        self.assertTrue(second in others)
+
+
+    def test_concretization_cache(self):
+        cache_dir = tempfile.mkdtemp()
+        try:
+            cache = ConcretizationCache(cache_dir)
+            abstract = Spec('mpileaks ^mpich')
+            concrete = cache.concretized(abstract)
+            self.assertFalse(abstract.concrete)
+            self.assertTrue(concrete.concrete)
+
+            path = cache.path_for_key(cache.key(abstract))
+            with open(path) as entry_file:
+                entry = json.load(entry_file)
+
+            # Providers of virtual dependencies are recorded as inputs.
+            self.assertTrue('zmpi' in entry['inputs']['packages'])
+
+            cached = cache._read(path)
+            self.assertTrue(cached is not None)
+            self.assertTrue(cached.concrete)
+            self.assertEqual(concrete, cached)
+            self.assertTrue(cached.eq_dag(concrete))
+            self.assertEqual(concrete, cache.concretized(abstract))
+
+            # A changed package file invalidates the entry.
+            entry['inputs']['packages']['libelf'] = 'bogus'
+            with open(path, 'w') as entry_file:
+                json.dump(entry, entry_file)
+            self.assertTrue(cache._read(path) is None)
+            self.assertEqual(concrete, cache.concretized(abstract))
+            self.assertTrue(cache._read(path) is not None)
+
+            # So does a package that starts to provide a virtual
+            # dependency, even if its own file wasn't an input.
+            mpi_providers = spack.db.get_provider_index().providers['mpi']
+            mpi_providers[Spec('mpi@:10')] = Spec('fake')
+            try:
+                self.assertTrue(cache._read(path) is None)
+            finally:
+                del mpi_providers[Spec('mpi@:10')]
+            self.assertTrue(cache._read(path) is not None)
+
+            # So does a changed compiler configuration.
+            config = spack.config.get_config()
+            config.set_value('compiler', 'gcc@4.5.0', 'cc', '/other/gcc')
+            self.assertNotEqual(path, cache.path_for_key(cache.key(abstract)))
+        finally:
+            shutil.rmtree(cache_dir)
+            spack.config.get_config(refresh=True)
@@ -36,7 +36,8 @@ from llnl.util.filesystem import *
 import spack
 from spack.spec import Spec
 from spack.packages import PackageDB
-from spack.directory_layout import SpecHashDirectoryLayout
+from spack.package import DependencyValidationCache
+from spack.directory_layout import DirectoryLayout, SpecHashDirectoryLayout
 
 class DirectoryLayoutTest(unittest.TestCase):
     """Tests that a directory layout works correctly and produces a
@@ -46,11 +47,27 @@ class DirectoryLayoutTest(unittest.TestCase):
         self.tmpdir = tempfile.mkdtemp()
         self.layout = SpecHashDirectoryLayout(self.tmpdir)
 
+        # Keep caches filled by concretizing real packages out of
+        # Spack's own cache.
+        self.cache_dir = tempfile.mkdtemp()
+        self.real_cache_path = spack.cache_path
+        spack.cache_path = self.cache_dir
+        self.real_db = spack.db
+        spack.db = PackageDB(spack.packages_path)
+        self.real_validation_cache = spack.dependency_validation_cache
+        spack.dependency_validation_cache = DependencyValidationCache(
+            join_path(self.cache_dir, 'validated_dependencies.json'))
+
 
     def tearDown(self):
         shutil.rmtree(self.tmpdir, ignore_errors=True)
         self.layout = None
 
+        spack.cache_path = self.real_cache_path
+        spack.db = self.real_db
+        spack.dependency_validation_cache = self.real_validation_cache
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
 
     def test_read_and_write_spec(self):
         """This goes through each package in spack and creates a directory for
@@ -89,14 +106,14 @@ class DirectoryLayoutTest(unittest.TestCase):
             self.assertTrue(spec_from_file.concrete)
 
             # Ensure that specs that come out "normal" are really normal.
-            with closing(open(spec_path)) as spec_file:
-                read_separately = Spec(spec_file.read())
+            read_separately = Spec.from_json(open(spec_path).read())
+            self.assertTrue(read_separately.eq_dag(spec_from_file))
 
-                read_separately.normalize()
-                self.assertEqual(read_separately, spec_from_file)
+            read_separately.normalize()
+            self.assertEqual(read_separately, spec_from_file)
 
-                read_separately.concretize()
-                self.assertEqual(read_separately, spec_from_file)
+            read_separately.concretize()
+            self.assertEqual(read_separately, spec_from_file)
 
             # Make sure the dep hash of the read-in spec is the same
             self.assertEqual(spec.dep_hash(), spec_from_file.dep_hash())
@@ -153,3 +170,189 @@ class DirectoryLayoutTest(unittest.TestCase):
             self.assertEqual(spec.dep_hash(), spec_from_file.dep_hash())
 
         spack.db = tmp
+
+
+    def test_install_index(self):
+        """Ensure that the install index stays consistent with the
+           install tree, both when the layout modifies the tree and
+           when prefixes are removed out from under it.
+        """
+        specs = []
+        for name in ('libelf', 'libdwarf', 'mpich'):
+            spec = Spec(name)
+            spec.concretize()
+            self.layout.make_path_for_spec(spec)
+            specs.append(spec)
+
+        self.assertTrue(os.path.isfile(self.layout.index_file_path()))
+        self.assertEqual(sorted(specs), sorted(self.layout.all_specs()))
+
+        # A fresh layout on the same root reads from the index file.
+        layout = SpecHashDirectoryLayout(self.tmpdir)
+        self.assertEqual(sorted(specs), sorted(layout.all_specs()))
+
+        # Removing a prefix through the layout updates the index.
+        self.layout.remove_path_for_spec(specs[0])
+        self.assertEqual(sorted(specs[1:]), sorted(self.layout.all_specs()))
+
+        # Removing a prefix behind the layout's back changes the parent
+        # directory's mtime, which triggers a rescan of that directory.
+        path = layout.path_for_spec(specs[1])
+        shutil.rmtree(path)
+        parent = os.path.dirname(path)
+        if os.path.isdir(parent):
+            os.utime(parent, (0, 0))
+        self.assertEqual(specs[2:], list(layout.all_specs()))
+
+
+    def test_install_index_concurrent_install(self):
+        """Ensure that a prefix that another process creates in the same
+           directory while a spec is being installed gets indexed.
+        """
+        libelf = Spec('libelf')
+        libelf.concretize()
+        mpich = Spec('mpich')
+        mpich.concretize()
+        self.assertEqual(os.path.dirname(self.layout.path_for_spec(libelf)),
+                         os.path.dirname(self.layout.path_for_spec(mpich)))
+
+        # The other process installs mpich after this layout has brought
+        # its index up to date, but before it records the new mtime.
+        other = SpecHashDirectoryLayout(self.tmpdir)
+        write_spec = self.layout.write_spec
+        def write_spec_racing(spec, path):
+            write_spec(spec, path)
+            other.make_path_for_spec(mpich)
+        self.layout.write_spec = write_spec_racing
+
+        self.layout.make_path_for_spec(libelf)
+        self.assertEqual(sorted([libelf, mpich]), sorted(self.layout.all_specs()))
+
+        layout = SpecHashDirectoryLayout(self.tmpdir)
+        self.assertEqual(sorted([libelf, mpich]), sorted(layout.all_specs()))
+
+
+    def test_install_index_coarse_mtime(self):
+        """Ensure that a prefix created without changing its directory's
+           mtime, as on filesystems with coarse mtimes, gets indexed.
+        """
+        libelf = Spec('libelf')
+        libelf.concretize()
+        mpich = Spec('mpich')
+        mpich.concretize()
+
+        # Give the directory a whole-second mtime, as NFS would.
+        self.layout.make_path_for_spec(libelf)
+        parent = os.path.dirname(self.layout.path_for_spec(libelf))
+        mtime = int(os.stat(parent).st_mtime)
+        os.utime(parent, (mtime, mtime))
+        self.assertEqual([libelf], list(self.layout.all_specs()))
+
+        SpecHashDirectoryLayout(self.tmpdir).make_path_for_spec(mpich)
+        os.utime(parent, (mtime, mtime))
+        self.assertEqual(sorted([libelf, mpich]), sorted(self.layout.all_specs()))
+
+        # Once the mtime settles, it is recorded and trusted.
+        os.utime(parent, (0, 0))
+        list(self.layout.all_specs())
+        rel_dir = os.path.relpath(parent, self.tmpdir)
+        self.assertEqual(0, self.layout._index[rel_dir]['mtime'])
+
+
+    def test_installed_dependents(self):
+        """Ensure that the reverse-dependency index finds installed
+           dependents of a spec, and forgets them when they're removed.
+        """
+        libdwarf = Spec('libdwarf')
+        libdwarf.concretize()
+        libelf = libdwarf['libelf']
+
+        self.layout.make_path_for_spec(libelf)
+        self.assertEqual([], self.layout.installed_dependents(libelf))
+
+        self.layout.make_path_for_spec(libdwarf)
+        self.assertEqual([libdwarf], self.layout.installed_dependents(libelf))
+        self.assertEqual([self.layout.path_for_spec(libdwarf)],
+                         self.layout.installed_dependent_paths(libelf))
+        self.assertEqual(
+            [self.layout.path_for_spec(libdwarf)],
+            DirectoryLayout.installed_dependent_paths(self.layout, libelf))
+        self.assertEqual([], self.layout.installed_dependents(libdwarf))
+
+        # A fresh layout gets the same answer from the index file.
+        layout = SpecHashDirectoryLayout(self.tmpdir)
+        self.assertEqual([libdwarf], layout.installed_dependents(libelf))
+
+        self.layout.remove_path_for_spec(libdwarf)
+        self.assertEqual([], self.layout.installed_dependents(libelf))
+
+
+    def test_read_old_spec_format(self):
+        """Ensure that spec files written in the old tree format can
+           still be read."""
+        spec = Spec('mpileaks')
+        spec.concretize()
+
+        spec_path = join_path(self.tmpdir, 'old.spec')
+        with closing(open(spec_path, 'w')) as spec_file:
+            spec_file.write(spec.tree(ids=False, cover='nodes'))
+
+        spec_from_file = self.layout.read_spec(spec_path)
+        self.assertTrue(spec_from_file.concrete)
+        self.assertEqual(spec, spec_from_file)
+        self.assertEqual(spec.dep_hash(), spec_from_file.dep_hash())
+
+        # Normalization is deferred until the package is needed.
+        self.assertFalse(spec.eq_dag(spec_from_file))
+        spec_from_file.package
+        self.assertTrue(spec.eq_dag(spec_from_file))
+
+
+    def test_list_without_loading_packages(self):
+        """Listing installed specs should not import any package files."""
+        for name in ('libdwarf', 'mpich'):
+            spec = Spec(name)
+            spec.concretize()
+            self.layout.make_path_for_spec(spec)
+
+        real_db = spack.db
+        spack.db = PackageDB(spack.packages_path)
+        try:
+            layout = SpecHashDirectoryLayout(self.tmpdir)
+            specs = list(layout.all_specs())
+            self.assertEqual(2, len(specs))
+            self.assertTrue(all(s.concrete for s in specs))
+
+            cache = PackageDB.get_class_for_package_name.cache
+            self.assertFalse(any(args[0] is spack.db for args in cache))
+        finally:
+            spack.db = real_db
+
+
+    def test_query(self):
+        """Ensure that indexed queries find the same specs that a full
+           scan with satisfies() would find."""
+        installed = []
+        for name in ('libelf', 'libdwarf', 'mpich'):
+            spec = Spec(name)
+            spec.concretize()
+            self.layout.make_path_for_spec(spec)
+            installed.append(spec)
+
+        def scan(*queries):
+            return sorted(s for s in self.layout.all_specs()
+                          if any(s.satisfies(q) for q in queries))
+
+        queries = [Spec('libelf'),
+                   Spec('libelf%' + str(installed[0].compiler)),
+                   Spec('libelf%nosuchcompiler'),
+                   Spec('libelf@0:'),
+                   Spec('libdwarf ^libelf'),
+                   Spec('mpich=nosucharch')]
+
+        for query in queries:
+            self.assertEqual(scan(query), sorted(self.layout.query(query)))
+
+        self.assertEqual(scan(*queries), sorted(self.layout.query(*queries)))
+        self.assertEqual(sorted(installed[:2]),
+                         sorted(self.layout.query(Spec('libelf'), Spec('libdwarf'))))
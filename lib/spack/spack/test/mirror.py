@@ -132,6 +132,22 @@ class MirrorTest(MockPackagesTest):
             stage.destroy()
 
 
+    def test_matching_versions(self):
+        def matching(spec, **kwargs):
+            return [str(s.version) for s in
+                    spack.mirror.get_matching_versions([Spec(spec)], **kwargs)]
+
+        self.assertEqual(['1.5', '1.4', '1.3', '1.2', '1.1', '1.0'],
+                         matching('mpich2'))
+        self.assertEqual(['1.2', '1.1', '1.0'], matching('mpich2@:1.2'))
+
+        # num_versions limits the known versions considered, and the
+        # spec then filters those.
+        self.assertEqual(['1.5', '1.4'], matching('mpich2', num_versions=2))
+        self.assertEqual(['1.2'], matching('mpich2@:1.2', num_versions=4))
+        self.assertEqual([], matching('mpich2@:1.2', num_versions=2))
+
+
     def test_git_mirror(self):
         self.set_up_package('git-test', MockGitRepo, 'git')
         self.check_mirror()
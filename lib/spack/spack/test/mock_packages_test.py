@@ -23,10 +23,16 @@
 # Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
 ##############################################################################
 import unittest
+import shutil
+import tempfile
+
+from llnl.util.filesystem import join_path
 
 import spack
 import spack.config
+import spack.package
 from spack.packages import PackageDB
+from spack.package import DependencyValidationCache
 from spack.spec import Spec
 
 
@@ -36,6 +42,7 @@ def set_pkg_dep(pkg, spec):
     """
     spec = Spec(spec)
     spack.db.get(pkg).dependencies[spec.name] = spec
+    spack.package._dependency_signatures.clear()
 
 
 class MockPackagesTest(unittest.TestCase):
@@ -51,9 +58,20 @@ class MockPackagesTest(unittest.TestCase):
             'site' : spack.mock_site_config,
             'user' : spack.mock_user_config }
 
+        # Keep results for mock packages out of Spack's own cache.
+        self.cache_dir = tempfile.mkdtemp()
+        self.real_cache_path = spack.cache_path
+        spack.cache_path = self.cache_dir
+        self.real_validation_cache = spack.dependency_validation_cache
+        spack.dependency_validation_cache = DependencyValidationCache(
+            join_path(self.cache_dir, 'validated_dependencies.json'))
+
 
     def tearDown(self):
         """Restore the real packages path after any test."""
         spack.db = self.real_db
         spack.config._scopes = self.real_scopes
+        spack.cache_path = self.real_cache_path
+        spack.dependency_validation_cache = self.real_validation_cache
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
 
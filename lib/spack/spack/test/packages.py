@@ -22,12 +22,17 @@
 # along with this program; if not, write to the Free Software Foundation,
 # Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
 ##############################################################################
+import os
+import shutil
+import tempfile
 import unittest
 
 from llnl.util.filesystem import join_path
 
 import spack
 import spack.packages as packages
+from spack.spec import Spec
+from spack.virtual import ProviderIndex
 from spack.util.naming import mod_to_class
 from spack.test.mock_packages_test import *
 
@@ -64,3 +69,156 @@ class PackagesTest(MockPackagesTest):
         self.assertEqual('PmgrCollective', mod_to_class('pmgr-collective'))
         self.assertEqual('Pmgrcollective', mod_to_class('PmgrCollective'))
         self.assertEqual('_3db',        mod_to_class('3db'))
+
+
+    def test_package_metadata(self):
+        for name in ('mpich', 'mpileaks', 'zmpi'):
+            cls = spack.db.get_class_for_package_name(name)
+            metadata = spack.db.metadata(name)
+            self.assertEqual(cls.homepage, metadata.homepage)
+            self.assertEqual(cls.url, metadata.url)
+            self.assertEqual(cls.__doc__, metadata.doc)
+            self.assertEqual(sorted(cls.versions), metadata.versions)
+            self.assertEqual(cls.dependencies, metadata.dependencies)
+            self.assertEqual(cls.provided, metadata.provided)
+
+
+    def test_package_metadata_cache(self):
+        repo = tempfile.mkdtemp()
+        try:
+            for name in ('mpich', 'zmpi', 'fake'):
+                shutil.copytree(join_path(spack.mock_packages_path, name),
+                                join_path(repo, name))
+            db = packages.PackageDB(repo)
+            db.metadata('mpich')
+
+            # Entries are only written out when the cache is saved.
+            self.assertFalse(os.path.exists(db.metadata_cache.path))
+            db.metadata_cache.save()
+            self.assertTrue(os.path.exists(db.metadata_cache.path))
+
+            # A new DB reads cached metadata without importing packages.
+            def no_import(pkg_name):
+                self.fail("Imported %s" % pkg_name)
+            db = packages.PackageDB(repo)
+            db.get_class_for_package_name = no_import
+            self.assertTrue('mpi' in [p.name for p in db.metadata('mpich').provided])
+
+            # Changed package files are read again.
+            self.assertRaises(AssertionError, db.metadata, 'zmpi')
+            db = packages.PackageDB(repo)
+            db.metadata('zmpi')
+            db.metadata_cache.save()
+            with open(db.filename_for_package_name('zmpi'), 'a') as pkg_file:
+                pkg_file.write('\n')
+            db = packages.PackageDB(repo)
+            db.get_class_for_package_name = no_import
+            db.metadata('mpich')
+            self.assertRaises(AssertionError, db.metadata, 'zmpi')
+
+            self.assertRaises(packages.UnknownPackageError,
+                              db.metadata, 'not-a-package')
+        finally:
+            shutil.rmtree(repo)
+
+
+    def test_package_metadata_from_cache_file(self):
+        spack.db.metadata('mpich')
+        spack.db.metadata('mpileaks')
+        spack.db.metadata_cache.save()
+
+        # Metadata from a reloaded cache file holds str, not unicode.
+        db = packages.PackageDB(spack.mock_packages_path)
+        def no_import(pkg_name):
+            self.fail("Imported %s" % pkg_name)
+        db.get_class_for_package_name = no_import
+
+        mpich = db.metadata('mpich')
+        for provided, provider in mpich.provided.items():
+            self.assertTrue(isinstance(provided.name, str))
+            self.assertTrue(isinstance(provider.name, str))
+        for version in mpich.versions:
+            self.assertTrue(isinstance(version.string, str))
+        for name, dep in db.metadata('mpileaks').dependencies.items():
+            self.assertTrue(isinstance(name, str))
+            self.assertTrue(isinstance(dep.name, str))
+
+        # Specs parsed from the same strings afterwards are still str.
+        spec = Spec('mpi')
+        self.assertTrue(isinstance(spec.name, str))
+        spec = Spec('mpileaks ^mpich')
+        spec.concretize()
+        for node in spec.traverse():
+            self.assertTrue(isinstance(node.name, str))
+            self.assertTrue(isinstance(node.version.string, str))
+
+
+    def test_package_metadata_non_ascii_doc(self):
+        repo = tempfile.mkdtemp()
+        try:
+            pkg_dir = join_path(repo, 'accented')
+            os.mkdir(pkg_dir)
+            with open(join_path(pkg_dir, 'package.py'), 'w') as pkg_file:
+                pkg_file.write(
+                    "# -*- coding: utf-8 -*-\n"
+                    "from spack import *\n"
+                    "class Accented(Package):\n"
+                    "    \"\"\"Caf\xc3\xa9 na\xc3\xafve r\xc3\xa9sum\xc3\xa9.\"\"\"\n"
+                    "    homepage = 'http://www.example.com'\n"
+                    "    url = 'http://www.example.com/accented-1.0.tar.gz'\n"
+                    "    version('1.0', 'foobarbaz')\n")
+
+            db = packages.PackageDB(repo)
+            doc = db.get_class_for_package_name('accented').__doc__
+            self.assertEqual(doc, db.metadata('accented').doc)
+            db.metadata_cache.save()
+
+            # Cached metadata has the same str types as the class.
+            db = packages.PackageDB(repo)
+            metadata = db.metadata('accented')
+            self.assertTrue(isinstance(metadata.doc, str))
+            self.assertEqual(doc, metadata.doc)
+            self.assertTrue(isinstance(metadata.homepage, str))
+            self.assertTrue(isinstance(metadata.url, str))
+        finally:
+            shutil.rmtree(repo)
+
+
+    def test_provider_index_from_metadata(self):
+        # Entries are the ones that reading each package would make.
+        self.assertEqual(
+            ProviderIndex(spack.db.all_package_names()).providers,
+            spack.db._build_provider_index().providers)
+
+        repo = tempfile.mkdtemp()
+        try:
+            for name in ('mpich', 'zmpi', 'fake'):
+                shutil.copytree(join_path(spack.mock_packages_path, name),
+                                join_path(repo, name))
+            db = packages.PackageDB(repo)
+            providers = set(s.name for s in db.providers_for('mpi'))
+            self.assertEqual(set(['mpich', 'zmpi']), providers)
+
+            # A new DB builds its provider index from cached metadata.
+            def no_import(pkg_name):
+                self.fail("Imported %s" % pkg_name)
+            db = packages.PackageDB(repo)
+            db.get_class_for_package_name = no_import
+            self.assertEqual(
+                providers, set(s.name for s in db.providers_for('mpi')))
+
+            # Only packages whose files changed are imported again.
+            with open(db.filename_for_package_name('zmpi'), 'a') as pkg_file:
+                pkg_file.write('\n')
+            imported = []
+            db = packages.PackageDB(repo)
+            real_get_class = db.get_class_for_package_name
+            def record_import(pkg_name):
+                imported.append(pkg_name)
+                return real_get_class(pkg_name)
+            db.get_class_for_package_name = record_import
+            self.assertEqual(
+                providers, set(s.name for s in db.providers_for('mpi')))
+            self.assertEqual(['zmpi'], imported)
+        finally:
+            shutil.rmtree(repo)
@@ -28,12 +28,16 @@ You can find the dummy packages here::
 
     spack/lib/spack/spack/test/mock_packages
 """
+import hashlib
+
 import spack
 import spack.package
 
 from llnl.util.lang import list_modules
 
 from spack.spec import Spec
+from spack.version import Version, VersionList
+from spack.package import DependencyValidationCache
 from spack.test.mock_packages_test import *
 
 
@@ -138,6 +142,123 @@ class SpecDagTest(MockPackagesTest):
         self.assertEqual([(x, y.name) for x,y in traversal], pairs)
 
 
+    def test_cached_traversal(self):
+        dag = Spec('mpileaks ^zmpi')
+        dag.normalize()
+
+        # Cached and uncached traversals agree.
+        for order in ('pre', 'post'):
+            for cover in ('nodes', 'edges'):
+                for direction in ('children', 'parents'):
+                    node = dag if direction == 'children' else dag['libelf']
+                    kwargs = { 'order' : order, 'cover' : cover,
+                               'direction' : direction, 'depth' : True }
+                    cached = list(node.traverse(**kwargs))
+                    self.assertEqual(cached, list(node.traverse(**kwargs)))
+                    self.assertEqual(
+                        cached, list(node.traverse(key=id, **kwargs)))
+
+        # Changing the DAG invalidates cached orders.
+        self.assertFalse('libelf-extra' in [s.name for s in dag.traverse()])
+        dag['libelf']._add_dependency(Spec('libelf-extra'))
+        names = [s.name for s in dag.traverse()]
+        self.assertTrue('libelf-extra' in names)
+        self.assertEqual(names, [s.name for s in dag.traverse(key=id)])
+
+        # So does changing a dependency map directly.
+        dag['libelf-extra'].dependencies['direct_mpich'] = Spec('direct_mpich')
+        self.assertTrue('direct_mpich' in [s.name for s in dag.traverse()])
+
+
+    def test_structure_change_clears_affected_caches(self):
+        dag = Spec('mpileaks ^zmpi')
+        dag.normalize()
+        libelf_parents = [s.name for s in dag['libelf'].traverse(direction='parents')]
+        fake_parents = [s.name for s in dag['fake'].traverse(direction='parents')]
+        list(dag.traverse())
+
+        # Only caches whose traversals include libelf are cleared.
+        dag['libelf']._add_dependency(Spec('libelf-extra'))
+        self.assertEqual({}, dag._cached_orders)
+        self.assertEqual({}, dag['libelf']._cached_orders)
+        self.assertNotEqual({}, dag['fake']._cached_orders)
+        self.assertEqual(
+            fake_parents,
+            [s.name for s in dag['fake'].traverse(direction='parents')])
+        self.assertEqual(
+            libelf_parents,
+            [s.name for s in dag['libelf'].traverse(direction='parents')])
+        self.assertTrue('libelf-extra' in [s.name for s in dag.traverse()])
+
+        # Each node counts the cached traversals it is in.
+        refs = {}
+        for spec in dag.traverse():
+            for nodes in spec._cached_orders.values():
+                for d, node in nodes:
+                    refs[id(node)] = refs.get(id(node), 0) + 1
+        for spec in dag.traverse(key=id):
+            self.assertEqual(refs.get(id(spec), 0), spec._cache_refs)
+
+        # Building a DAG doesn't search it for caches to clear.
+        dag = Spec('mpileaks')
+        dag.concretize()
+        clears = []
+        clear = Spec._clear_structure_caches
+        def count_clears(spec):
+            clears.append(spec)
+            return clear(spec)
+
+        Spec._clear_structure_caches = count_clears
+        try:
+            Spec.from_json(dag.to_json())
+            dag.copy()
+            self.assertEqual([], clears)
+        finally:
+            Spec._clear_structure_caches = clear
+
+
+    def test_traversal_cache_is_used(self):
+        walks = []
+        traverse_nodes = Spec._traverse_nodes
+        def count_walks(spec, *args):
+            walks.append(spec)
+            return traverse_nodes(spec, *args)
+
+        Spec._traverse_nodes = count_walks
+        try:
+            dag = Spec('mpileaks ^zmpi')
+            dag.normalize()
+            list(dag.traverse())
+            del walks[:]
+            list(dag.traverse())
+            self.assertEqual([], walks)
+
+            # Changes to other DAGs keep the cached order.
+            Spec('libelf')._add_dependency(Spec('libelf-extra'))
+            Spec('mpileaks').copy()
+            del walks[:]
+            list(dag.traverse())
+            self.assertEqual([], walks)
+
+            # Most traversals during concretization are served from
+            # the cache.
+            calls = []
+            traverse = Spec.traverse
+            def count_calls(spec, *args, **kwargs):
+                calls.append(spec)
+                return traverse(spec, *args, **kwargs)
+
+            Spec.traverse = count_calls
+            try:
+                del walks[:]
+                Spec('mpileaks').concretize()
+            finally:
+                Spec.traverse = traverse
+            self.assertTrue(len(walks) < len(calls) / 2)
+        finally:
+            Spec._traverse_nodes = traverse_nodes
+
+
     def test_conflicting_spec_constraints(self):
         mpileaks = Spec('mpileaks ^mpich ^callpath ^dyninst ^libelf ^libdwarf')
         try:
@@ -254,6 +375,16 @@ class SpecDagTest(MockPackagesTest):
         self.assertRaises(spack.spec.UnsatisfiableArchitectureSpecError, spec.normalize)
 
 
+    def test_unsatisfiable_provider(self):
+        spec = Spec('direct_mpich ^mpi@10.0')
+        try:
+            spec.normalize()
+            self.fail("Expected UnsatisfiableProviderSpecError")
+        except spack.spec.UnsatisfiableProviderSpecError, e:
+            self.assertEqual('mpi', e.provided.name)
+            self.assertEqual('mpich', e.required.name)
+
+
     def test_invalid_dep(self):
         spec = Spec('libelf ^mpich')
         self.assertRaises(spack.spec.InvalidDependencyException, spec.normalize)
@@ -445,3 +576,170 @@ class SpecDagTest(MockPackagesTest):
         orig_ids = set(id(s) for s in orig.traverse())
         copy_ids = set(id(s) for s in copy.traverse())
         self.assertFalse(orig_ids.intersection(copy_ids))
+
+
+    def test_json_round_trip(self):
+        orig = Spec('mpileaks')
+        orig.concretize()
+        copy = Spec.from_json(orig.to_json())
+
+        self.check_links(copy)
+
+        self.assertEqual(orig, copy)
+        self.assertTrue(orig.eq_dag(copy))
+        self.assertEqual(orig.dep_hash(), copy.dep_hash())
+
+
+    def test_dep_hash_is_cached(self):
+        def uncached_hash(spec):
+            dep_string = ''.join('^' + d.format() for d in spec.sorted_deps())
+            return hashlib.sha1(dep_string).hexdigest()
+
+        spec = Spec('mpileaks')
+        spec.concretize()
+        for node in spec.traverse():
+            self.assertEqual(uncached_hash(node), node.dep_hash())
+            self.assertEqual(node.dep_hash(), node._cached_hash)
+
+        # Copies of concrete specs keep their hashes.
+        copy = spec.copy()
+        self.assertEqual(spec.dep_hash(), copy._cached_hash)
+
+        # Copies don't share nodes with the original.
+        spec.dep_hash()
+        for node in copy.traverse():
+            for dep in node._dep_closure().values():
+                self.assertTrue(dep is copy[dep.name])
+
+        # Changing the DAG invalidates hashes of all dependents.
+        old_hash = spec.dep_hash()
+        spec['libelf']._add_dependency(Spec('libelf-extra@1.0'))
+        self.assertEqual(None, spec._cached_hash)
+        self.assertEqual(uncached_hash(spec), spec.dep_hash())
+        self.assertNotEqual(old_hash, spec.dep_hash())
+
+
+    def test_copy_is_independent_of_original(self):
+        spec = Spec('mpileaks')
+        spec.concretize()
+        spec.dep_hash()
+        copy = spec.copy()
+        copy_hash = hash(copy)
+        expected = spec.copy()
+
+        def mutate(spec):
+            spec['libelf'].versions = VersionList([Version('9.9')])
+            spec['callpath']._add_dependency(Spec('libelf-extra@1.0'))
+
+        old_hash = spec.dep_hash()
+        mutate(spec)
+
+        self.assertEqual(copy_hash, hash(copy))
+        self.assertEqual(expected, copy)
+        self.assertNotEqual(spec, copy)
+        self.assertEqual({copy : 'x'}[expected], 'x')
+        self.assertEqual(old_hash, copy.dep_hash())
+
+        # The mutated spec's hashes are recomputed, and match those of
+        # an equivalent spec that never had hashes cached.
+        fresh = Spec('mpileaks')
+        fresh.concretize()
+        mutate(fresh)
+        self.assertNotEqual(old_hash, spec.dep_hash())
+        for name in ('mpileaks', 'callpath'):
+            self.assertEqual(fresh[name].dep_hash(), spec[name].dep_hash())
+
+
+    def test_frozen_spec(self):
+        spec = Spec('mpileaks')
+        spec.concretize()
+        copy = spec.copy()
+        self.assertEqual(hash(copy), hash(spec))
+
+        spec.freeze()
+        self.assertEqual(spec, copy)
+        self.assertEqual(hash(spec), hash(copy))
+        self.assertEqual(hash(spec), spec._cached_key_hash)
+        self.assertTrue(spec.eq_dag(copy))
+        self.assertTrue(spec.eq_dag(spec))
+
+        # Frozen specs work as dict keys for unfrozen lookups.
+        self.assertEqual('x', {spec : 'x'}[copy])
+
+        # Frozen specs can't be changed, but copies of them can.
+        self.assertRaises(spack.spec.FrozenSpecError,
+                          spec['libelf']._add_dependency, Spec('libelf-extra@1.0'))
+        unfrozen = spec.copy()
+        unfrozen['libelf']._add_dependency(Spec('libelf-extra@1.0'))
+        self.assertNotEqual(spec, unfrozen)
+
+        # Abstract specs can't be frozen.
+        self.assertRaises(spack.spec.SpecError, Spec('mpileaks').freeze)
+
+
+    def test_name_index(self):
+        spec = Spec('mpileaks ^mpich ^callpath ^dyninst ^libelf ^libdwarf')
+        spec.normalize()
+        self.assertTrue(spec['libelf'] is spec['dyninst'].dependencies['libelf'])
+        self.assertTrue(spec['mpileaks'] is spec)
+        self.assertRaises(KeyError, spec.__getitem__, 'libelf-extra')
+
+        other = Spec('dyninst ^libdwarf ^libelf')
+        self.assertEqual(set(['libdwarf', 'libelf']),
+                         spec.common_dependencies(other))
+        self.assertEqual(set(['mpich', 'callpath', 'dyninst']),
+                         spec.dep_difference(other))
+
+        # Lookups see structural changes to the DAG.
+        spec['libelf']._add_dependency(Spec('libelf-extra'))
+        self.assertEqual('libelf-extra', spec['libelf-extra'].name)
+        self.assertTrue('libelf-extra' in spec.dep_difference(other))
+
+
+    def test_provider_index(self):
+        spec = Spec('mpileaks ^mpich')
+        spec.concretize()
+        index = spec._provider_index()
+        self.assertTrue(index is spec._provider_index())
+        self.assertTrue(index.provides(spec['mpich'], 'mpi'))
+        self.assertTrue(index.provides(spec['mpich'], Spec('mpi@:3')))
+        self.assertFalse(index.provides(spec['mpich'], Spec('mpi@10:')))
+        self.assertFalse(index.provides(spec['libelf'], 'mpi'))
+
+        # Changes to other DAGs don't affect the index, but changes to
+        # this one rebuild it.
+        Spec('libelf')._add_dependency(Spec('libdwarf'))
+        self.assertTrue(index is spec._provider_index())
+        spec['libelf']._add_dependency(Spec('libelf-extra'))
+        self.assertFalse(index is spec._provider_index())
+
+        # Indexes over specs that are not concrete are not kept.
+        spec = Spec('mpileaks ^mpich')
+        spec.normalize()
+        self.assertFalse(spec._provider_index() is spec._provider_index())
+
+
+    def test_dependency_validation_cache(self):
+        cache = spack.dependency_validation_cache
+        pkg = Spec('mpileaks').package
+        pkg.validate_dependencies()
+
+        signature = pkg._dependency_signature()
+        self.assertTrue(signature in cache)
+        self.assertEqual(None, cache[signature])
+
+        # Results are kept on disk once saved.
+        self.assertFalse(signature in DependencyValidationCache(cache.path))
+        cache.save()
+        self.assertTrue(signature in DependencyValidationCache(cache.path))
+
+        # Changing the dependencies of a dependency invalidates the result.
+        set_pkg_dep('mpileaks', 'mpich@1.0')
+        set_pkg_dep('callpath', 'mpich@2.0')
+        conflicting = pkg._dependency_signature()
+        self.assertNotEqual(signature, conflicting)
+
+        for i in range(2):
+            self.assertRaises(spack.package.InvalidPackageDependencyError,
+                              pkg.validate_dependencies)
+        self.assertTrue('inconsistent' in cache[conflicting])
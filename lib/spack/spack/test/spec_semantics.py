@@ -24,6 +24,7 @@
 ##############################################################################
 import unittest
 from spack.spec import *
+from spack.virtual import ProviderIndex
 from spack.test.mock_packages_test import *
 
 class SpecSematicsTest(MockPackagesTest):
@@ -147,6 +148,20 @@ class SpecSematicsTest(MockPackagesTest):
         self.check_unsatisfiable('mpileaks^mpi@3:', '^mpich@1.0')
 
 
+    def test_provider_index_satisfies(self):
+        def index(*specs):
+            return ProviderIndex([Spec(s) for s in specs], restrict=True)
+
+        self.assertTrue(index('mpich').satisfies(index('mpich@3.0.4')))
+        self.assertTrue(index('mpich', 'zmpi').satisfies(index('zmpi')))
+        self.assertTrue(index('libelf').satisfies(index('mpich2')))
+
+        self.assertFalse(index('mpich').satisfies(index('mpich2')))
+        self.assertFalse(index('mpich@3.0.4').satisfies(index('mpich@3.0.3')))
+        self.assertFalse(index('mpich%gcc').satisfies(index('mpich%clang')))
+        self.assertFalse(index('mpich=bgq').satisfies(index('mpich=x86')))
+
+
     def test_constrain(self):
         self.check_constrain('libelf@2.1:2.5', 'libelf@0:2.5', 'libelf@2.1:3')
         self.check_constrain('libelf@2.1:2.5%gcc@4.5:4.6',
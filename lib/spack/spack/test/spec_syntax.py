@@ -178,3 +178,23 @@ class SpecSyntaxTest(unittest.TestCase):
         self.check_lex(
             complex_lex,
             "mvapich_foo ^ _openmpi @ 1.2 : 1.4 , 1.6 % intel @ 12.1 : 12.6 + debug - qt_4 ^ stackwalker @ 8.1_1e")
+
+    def test_parse_cache_returns_copies(self):
+        spec = Spec('mvapich_foo@1.2 ^_openmpi@1.6')
+        spec.versions.intersect(VersionList(['1.2']))
+        spec.dependencies['_openmpi']._add_version(Version('1.7'))
+
+        copy = Spec('mvapich_foo@1.2 ^_openmpi@1.6')
+        self.assertEqual('mvapich_foo@1.2^_openmpi@1.6', str(copy))
+        self.assertTrue(copy.dependencies['_openmpi'].dependents['mvapich_foo']
+                        is copy)
+
+    def test_parse_cache_errors(self):
+        for i in range(2):
+            self.assertRaises(SpecParseError, Spec, 'x@1.2:3:4')
+            self.assertRaises(spack.parse.LexError, Spec, 'x^y$')
+
+    def test_token_positions(self):
+        tokens = SpecLexer().lex('mpich @ 1.2')
+        self.assertEqual([(0, 5), (6, 7), (8, 11)],
+                         [(t.start, t.end) for t in tokens])
@@ -28,7 +28,11 @@ We try to maintain compatibility with RPM's version semantics
 where it makes sense.
 """
 import unittest
+import copy
+import pickle
+
 from spack.version import *
+from spack.version import _versions
 
 
 class VersionsTest(unittest.TestCase):
@@ -329,6 +333,21 @@ class VersionsTest(unittest.TestCase):
                                 ['1.1:2.7'], ['2.5:3.0','1.0'])
         self.check_intersection(['0:1'], [':'], ['0:1'])
 
+        self.check_intersection(['1.2', '1.4:1.5', '1.7', '2.1'],
+                                ['1.0:1.2', '1.4:1.7', '2.0:'],
+                                ['1.2:1.5', '1.7', '1.9', '2.1'])
+        self.check_intersection(['1.6', '1.8', '1.9'],
+                                ['1.6', '1.8:'],
+                                ['1.5', '1.6', '1.7', '1.8', '1.9'])
+
+
+    def test_list_contains(self):
+        self.assert_in(['1.2', '1.5'], ['1.0:1.3', '1.5', '2.0:'])
+        self.assert_in(['1.6.2', '3.0'], ['1.0:1.3', '1.6', '2.0:'])
+        self.assert_not_in(['1.2', '1.4'], ['1.0:1.3', '1.5', '2.0:'])
+        self.assert_not_in(['1.2:1.5'], ['1.0:1.3', '1.5', '2.0:'])
+        self.assert_not_in(['0.9'], ['1.0:1.3', '1.5', '2.0:'])
+
 
     def test_intersect_with_containment(self):
         self.check_intersection('1.6.5', '1.6.5', ':1.6')
@@ -422,3 +441,63 @@ class VersionsTest(unittest.TestCase):
 
         self.assert_satisfies('4.8.0', '4.2, 4.3:4.8')
         self.assert_satisfies('4.8.2', '4.2, 4.3:4.8')
+
+
+    def test_interned_versions(self):
+        self.assertTrue(Version('1.2.3') is Version('1.2.3'))
+        self.assertTrue(Version(Version('1.2.3')) is Version('1.2.3'))
+        self.assertTrue(ver('1.2:1.4') is ver('1.2:1.4'))
+        self.assertTrue(ver('1.2:1.4').start is Version('1.2'))
+
+        # Lists are mutable, so they are never shared.
+        self.assertFalse(ver('1.2,1.4') is ver('1.2,1.4'))
+
+        # Versions have no __dict__ to grow.
+        self.assertRaises(AttributeError, setattr, Version('1.2'), 'foo', 1)
+
+        # Versions nothing refers to are not kept.
+        Version('1.2.3.4.5.6.7.8.9')
+        self.assertFalse('1.2.3.4.5.6.7.8.9' in _versions)
+
+
+    def test_copy_and_pickle(self):
+        for v in (Version('1.2.3'), ver('1.2:1.4'), ver(':1.4'),
+                  ver('1.2,1.4:1.6'), VersionCatalog(['1.0', '1.2'])):
+            for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+                loaded = pickle.loads(pickle.dumps(v, protocol))
+                self.assertEqual(repr(v), repr(loaded))
+            self.assertEqual(repr(v), repr(copy.deepcopy(v)))
+            self.assertEqual(repr(v), repr(copy.copy(v)))
+
+        # Loaded versions are interned again.
+        v = Version('1.2.3')
+        self.assertTrue(pickle.loads(pickle.dumps(v)) is v)
+        self.assertTrue(copy.deepcopy(v) is v)
+
+
+    def test_version_catalog(self):
+        catalog = VersionCatalog(['1.0', '1.2', '1.2.1', '1.2.4', '1.3',
+                                  '1.10', '2.0', '2.0b', '2.1'])
+        self.assertEqual(ver(['1.0', '1.2', '1.2.1', '1.2.4', '1.3', '1.10',
+                              '2.0', '2.0b', '2.1']), VersionList(catalog))
+        self.assertTrue(Version('1.2.4') in catalog)
+        self.assertFalse(Version('1.2.2') in catalog)
+
+        def newest(vlist):
+            return str(catalog.newest_satisfying(ver(vlist)))
+
+        def satisfying(vlist):
+            return [str(v) for v in catalog.satisfying(ver(vlist))]
+
+        self.assertEqual('2.1', newest(':'))
+        self.assertEqual('1.2.4', newest('1.2'))
+        self.assertEqual('1.3', newest('1.1:1.3'))
+        self.assertEqual('1.2.4', newest(':1.2'))
+        self.assertEqual('2.0b', newest('1.0,2.0'))
+        self.assertEqual('None', newest('3:'))
+
+        self.assertEqual(['1.2', '1.2.1', '1.2.4'], satisfying('1.2'))
+        # 1.2 could be 1.2.3, so it satisfies 1.2.3:
+        self.assertEqual(['1.2', '1.2.4', '1.3', '1.10'],
+                         satisfying('1.2.3:1.10'))
+        self.assertEqual(['1.0', '2.0', '2.0b'], satisfying('1.0,2.0'))
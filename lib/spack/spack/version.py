@@ -31,6 +31,9 @@ VersionRange
   A range of versions of a package.
 VersionList
   A list of Versions and VersionRanges.
+VersionCatalog
+  An immutable, sorted set of Versions, e.g. the known versions of a
+  package, that can be searched for versions satisfying a VersionList.
 
 All of these types support the following operations, which can
 be called on any of the types::
@@ -46,13 +49,24 @@ be called on any of the types::
 import os
 import sys
 import re
-from bisect import bisect_left
+import weakref
+from bisect import bisect_left, bisect_right
 from functools import wraps
 from external.functools import total_ordering
 
 # Valid version characters
 VALID_VERSION = r'[A-Za-z0-9_.-]'
 
+# Regex for alphabetical and numeric segments of a version
+_segment_regex = re.compile(r'[a-zA-Z]+|[0-9]+')
+
+# Versions are immutable, so each version string is parsed only once
+# while its object is in use.  These map strings to their Version and
+# VersionRange objects.  They hold weak references, so that objects
+# nothing else refers to are freed rather than kept forever.
+_versions = weakref.WeakValueDictionary()
+_version_ranges = weakref.WeakValueDictionary()
+
 def int_if_int(string):
     """Convert a string to int if possible.  Otherwise, return a string."""
     try:
@@ -90,39 +104,83 @@ def coerce_versions(a, b):
             return (VersionList([a]), b)
 
 
+def _call_coerced(a, b, name):
+    """Coerce a and b to the same type and call the method with the
+       given name on them.  This is the slow path for mixed types."""
+    ca, cb = coerce_versions(a, b)
+    return getattr(ca, name)(cb)
+
+
 def coerced(method):
-    """Decorator that ensures that argument types of a method are coerced."""
+    """Decorator that ensures that argument types of a method are coerced.
+
+       Hot methods like comparisons skip this decorator and check for
+       arguments of their own type inline, calling _call_coerced() only
+       for mixed types.  That saves a function call per comparison.
+    """
     @wraps(method)
     def coercing_method(a, b):
         if type(a) == type(b) or a is None or b is None:
             return method(a, b)
         else:
-            ca, cb = coerce_versions(a, b)
-            return getattr(ca, method.__name__)(cb)
+            return _call_coerced(a, b, method.__name__)
     return coercing_method
 
 
-@total_ordering
+def _sort_key(segment):
+    """Sort key for a version segment.  Numbers are always "newer" than
+       letters.  This is for consistency with RPM.  See patch #60884 (and
+       details) from bugzilla #50977 in the RPM project at rpm.org.  Or
+       look at rpmvercmp.c if you want to see how this is implemented
+       there.
+    """
+    return (isinstance(segment, (int, long)), segment)
+
+
 class Version(object):
-    """Class to represent versions"""
-    def __init__(self, string):
+    """Class to represent versions.  Versions are immutable and interned:
+       constructing a Version from a string that was seen before returns
+       the same object.
+    """
+    __slots__ = ['string', 'version', 'separators', 'key', '__weakref__']
+
+    def __new__(cls, string):
+        if type(string) == Version:
+            return string
+
         string = str(string)
+        version = _versions.get(string)
+        if version is not None:
+            return version
 
         if not re.match(VALID_VERSION, string):
             raise ValueError("Bad characters in version string: %s" % string)
 
+        version = super(Version, cls).__new__(cls)
+
         # preserve the original string, but trimmed.
-        string = string.strip()
-        self.string = string
+        version.string = string.strip()
 
         # Split version into alphabetical and numeric segments
-        segment_regex = r'[a-zA-Z]+|[0-9]+'
-        segments = re.findall(segment_regex, string)
-        self.version = tuple(int_if_int(seg) for seg in segments)
+        segments = _segment_regex.findall(version.string)
+        version.version = tuple(int_if_int(seg) for seg in segments)
 
         # Store the separators from the original version string as well.
         # last element of separators is ''
-        self.separators = tuple(re.split(segment_regex, string)[1:-1])
+        version.separators = tuple(
+            _segment_regex.split(version.string)[1:-1])
+
+        # Versions sort by this key; see __lt__.
+        version.key = tuple(_sort_key(seg) for seg in version.version)
+
+        _versions[string] = version
+        return version
+
+
+    def __reduce__(self):
+        """Copy and pickle Versions by their string, so that they are
+           interned again when they are loaded."""
+        return (Version, (self.string,))
 
 
     def up_to(self, index):
@@ -140,13 +198,15 @@ class Version(object):
         return self
 
 
-    @coerced
     def satisfies(self, other):
         """A Version 'satisfies' another if it is at least as specific and has a
            common prefix.  e.g., we want gcc@4.7.3 to satisfy a request for
            gcc@4.7 so that when a user asks to build with gcc@4.7, we can find
            a suitable compiler.
         """
+        if type(other) != Version and other is not None:
+            return _call_coerced(self, other, 'satisfies')
+
         nself  = len(self.version)
         nother = len(other.version)
         return nother <= nself and self.version[:nother] == other.version
@@ -203,43 +263,45 @@ class Version(object):
         return self
 
 
-    @coerced
     def __lt__(self, other):
         """Version comparison is designed for consistency with the way RPM
            does things.  If you need more complicated versions in installed
            packages, you should override your package's version string to
            express it more sensibly.
         """
-        if other is None:
+        # Segments are compared with _sort_key().  If the common prefix is
+        # equal, the one with more segments is bigger.
+        if type(other) == Version:
+            return self.key < other.key
+        elif other is None:
             return False
+        return _call_coerced(self, other, '__lt__')
 
-        # Coerce if other is not a Version
-        # simple equality test first.
-        if self.version == other.version:
-            return False
 
-        for a, b in zip(self.version, other.version):
-            if a == b:
-                continue
-            else:
-                # Numbers are always "newer" than letters.  This is for
-                # consistency with RPM.  See patch #60884 (and details)
-                # from bugzilla #50977 in the RPM project at rpm.org.
-                # Or look at rpmvercmp.c if you want to see how this is
-                # implemented there.
-                if type(a) != type(b):
-                    return type(b) == int
-                else:
-                    return a < b
+    def __le__(self, other):
+        if type(other) == Version:
+            return self.key <= other.key
+        return self < other or self == other
 
-        # If the common prefix is equal, the one with more segments is bigger.
-        return len(self.version) < len(other.version)
+
+    def __gt__(self, other):
+        if type(other) == Version:
+            return self.key > other.key
+        return not (self < other or self == other)
+
+
+    def __ge__(self, other):
+        if type(other) == Version:
+            return self.key >= other.key
+        return not self < other
 
 
-    @coerced
     def __eq__(self, other):
-        return (other is not None and
-                type(other) == Version and self.version == other.version)
+        if type(other) == Version:
+            return self is other or self.version == other.version
+        elif other is None:
+            return False
+        return _call_coerced(self, other, '__eq__')
 
 
     def __ne__(self, other):
@@ -250,11 +312,12 @@ class Version(object):
         return hash(self.version)
 
 
-    @coerced
     def __contains__(self, other):
-        if other is None:
+        if type(other) == Version:
+            return other.version[:len(self.version)] == self.version
+        elif other is None:
             return False
-        return other.version[:len(self.version)] == self.version
+        return _call_coerced(self, other, '__contains__')
 
 
     def is_predecessor(self, other):
@@ -274,9 +337,11 @@ class Version(object):
         return other.is_predecessor(self)
 
 
-    @coerced
     def overlaps(self, other):
-        return self in other or other in self
+        if type(other) == Version:
+            n = min(len(self.version), len(other.version))
+            return self.version[:n] == other.version[:n]
+        return _call_coerced(self, other, 'overlaps')
 
 
     @coerced
@@ -299,6 +364,8 @@ class Version(object):
 
 @total_ordering
 class VersionRange(object):
+    __slots__ = ['start', 'end', '__weakref__']
+
     def __init__(self, start, end):
         if isinstance(start, basestring):
             start = Version(start)
@@ -311,6 +378,10 @@ class VersionRange(object):
             raise ValueError("Invalid Version range: %s" % self)
 
 
+    def __reduce__(self):
+        return (VersionRange, (self.start, self.end))
+
+
     def lowest(self):
         return self.start
 
@@ -319,15 +390,16 @@ class VersionRange(object):
         return self.end
 
 
-    @coerced
     def __lt__(self, other):
         """Sort VersionRanges lexicographically so that they are ordered first
            by start and then by end.  None denotes an open range, so None in
            the start position is less than everything except None, and None in
            the end position is greater than everything but None.
         """
-        if other is None:
-            return False
+        if type(other) != VersionRange:
+            if other is None:
+                return False
+            return _call_coerced(self, other, '__lt__')
 
         s, o = self, other
         if s.start != o.start:
@@ -337,11 +409,13 @@ class VersionRange(object):
                 o.end is None or (s.end is not None and s.end < o.end))
 
 
-    @coerced
     def __eq__(self, other):
-        return (other is not None and
-                type(other) == VersionRange and
-                self.start == other.start and self.end == other.end)
+        if type(other) != VersionRange:
+            if other is None:
+                return False
+            return _call_coerced(self, other, '__eq__')
+
+        return self.start == other.start and self.end == other.end
 
 
     def __ne__(self, other):
@@ -501,6 +575,8 @@ class VersionRange(object):
 @total_ordering
 class VersionList(object):
     """Sorted, non-redundant list of Versions and VersionRanges."""
+    __slots__ = ['versions']
+
     def __init__(self, vlist=None):
         self.versions = []
         if vlist is not None:
@@ -516,13 +592,17 @@ class VersionList(object):
                     self.add(ver(v))
 
 
+    def __reduce__(self):
+        return (VersionList, (self.versions,))
+
+
     def add(self, version):
         if type(version) in (Version, VersionRange):
             # This normalizes single-value version ranges.
             if version.concrete:
                 version = version.concrete
 
-            i = bisect_left(self, version)
+            i = bisect_left(self.versions, version)
 
             while i-1 >= 0 and version.overlaps(self[i-1]):
                 version = version.union(self[i-1])
@@ -576,11 +656,14 @@ class VersionList(object):
         if not other or not self:
             return False
 
+        # Both lists are sorted and non-overlapping, so a linear merge
+        # sweep finds any overlapping pair.
+        mine, theirs = self.versions, other.versions
         s = o = 0
-        while s < len(self) and o < len(other):
-            if self[s].overlaps(other[o]):
+        while s < len(mine) and o < len(theirs):
+            if mine[s].overlaps(theirs[o]):
                 return True
-            elif self[s] < other[o]:
+            elif mine[s] < theirs[o]:
                 s += 1
             else:
                 o += 1
@@ -597,11 +680,12 @@ class VersionList(object):
         if not other or not self:
             return False
 
+        mine, theirs = self.versions, other.versions
         s = o = 0
-        while s < len(self) and o < len(other):
-            if self[s].satisfies(other[o]):
+        while s < len(mine) and o < len(theirs):
+            if mine[s].satisfies(theirs[o]):
                 return True
-            elif self[s] < other[o]:
+            elif mine[s] < theirs[o]:
                 s += 1
             else:
                 o += 1
@@ -623,11 +707,24 @@ class VersionList(object):
 
     @coerced
     def intersection(self, other):
-        # TODO: make this faster.  This is O(n^2).
+        """Intersect two lists with a linear merge sweep.  After each
+           pair of elements is intersected, the one that ends first
+           can't overlap anything else in the other list, so we move
+           past it."""
         result = VersionList()
-        for s in self:
-            for o in other:
-                result.add(s.intersection(o))
+        mine, theirs = self.versions, other.versions
+        s = o = 0
+        while s < len(mine) and o < len(theirs):
+            if mine[s].overlaps(theirs[o]):
+                result.add(mine[s].intersection(theirs[o]))
+
+            if _ends_before(mine[s], theirs[o]):
+                s += 1
+            elif _ends_before(theirs[o], mine[s]):
+                o += 1
+            else:
+                s += 1
+                o += 1
         return result
 
 
@@ -642,12 +739,12 @@ class VersionList(object):
         if len(self) == 0:
             return False
 
+        # Elements of self don't overlap, so only the elements on either
+        # side of where a version would be inserted can contain it.
+        mine = self.versions
         for version in other:
-            i = bisect_left(self, other)
-            if i == 0:
-                if version not in self[0]:
-                    return False
-            elif all(version not in v for v in self[i-1:]):
+            i = bisect_left(mine, version)
+            if not any(version in v for v in mine[max(i-1, 0):i+1]):
                 return False
 
         return True
@@ -695,6 +792,147 @@ class VersionList(object):
         return str(self.versions)
 
 
+class VersionCatalog(object):
+    """Immutable, sorted set of concrete Versions, such as the known
+       versions of a package.  Versions that satisfy a VersionList are
+       found by binary search instead of by checking every version.
+    """
+    __slots__ = ['versions', 'keys']
+
+    def __init__(self, versions):
+        versions = set(ver(v) for v in versions)
+        if any(type(v) != Version for v in versions):
+            raise TypeError("VersionCatalog can only contain Versions")
+
+        self.versions = tuple(sorted(versions))
+        self.keys = [v.key for v in self.versions]
+
+
+    def __reduce__(self):
+        return (VersionCatalog, (self.versions,))
+
+
+    def _prefix_end(self, version):
+        """Index just past the last version that has version as a prefix
+           (or is version), or past where such a version would be.  A
+           key segment of (2,) sorts after any real segment."""
+        return bisect_right(self.keys, version.key + ((2,),))
+
+
+    def _matches(self, version):
+        """Index range of the versions that satisfy a Version."""
+        return bisect_left(self.keys, version.key), self._prefix_end(version)
+
+
+    def _prefixes(self, version):
+        """Indices of versions in this catalog that are proper prefixes
+           of version, lowest first."""
+        indices = []
+        for n in xrange(1, len(version.key)):
+            i = bisect_left(self.keys, version.key[:n])
+            if i < len(self.keys) and self.keys[i] == version.key[:n]:
+                indices.append(i)
+        return indices
+
+
+    def _satisfying(self, vrange):
+        """Indices of versions that satisfy a Version or VersionRange, as
+           a list of prefixes and a (lo, hi) range above them."""
+        if type(vrange) == Version:
+            return [], self._matches(vrange)
+
+        # A version satisfies start:end if it is between them, or if it
+        # has end as a prefix.  Versions that are prefixes of start
+        # (1.6 for 1.6.5:) satisfy the range as well.
+        if vrange.start is None:
+            prefixes, lo = [], 0
+        else:
+            prefixes = self._prefixes(vrange.start)
+            lo = bisect_left(self.keys, vrange.start.key)
+
+        if vrange.end is None:
+            hi = len(self.keys)
+        else:
+            hi = self._prefix_end(vrange.end)
+        return prefixes, (lo, max(lo, hi))
+
+
+    def satisfying(self, vlist):
+        """Return the versions in this catalog that satisfy some element
+           of vlist, lowest first."""
+        indices = set()
+        for v in _to_version_list(vlist):
+            prefixes, (lo, hi) = self._satisfying(v)
+            indices.update(prefixes)
+            indices.update(xrange(lo, hi))
+        return [self.versions[i] for i in sorted(indices)]
+
+
+    def newest_satisfying(self, vlist):
+        """Return the newest version in this catalog that satisfies some
+           element of vlist, or None if there is none."""
+        best = -1
+        for v in _to_version_list(vlist):
+            prefixes, (lo, hi) = self._satisfying(v)
+            if hi > lo:
+                best = max(best, hi - 1)
+            elif prefixes:
+                best = max(best, prefixes[-1])
+        return self.versions[best] if best >= 0 else None
+
+
+    def __contains__(self, version):
+        i = bisect_left(self.keys, version.key)
+        return i < len(self.keys) and self.keys[i] == version.key
+
+
+    def __getitem__(self, index):
+        return self.versions[index]
+
+
+    def __iter__(self):
+        return iter(self.versions)
+
+
+    def __reversed__(self):
+        return reversed(self.versions)
+
+
+    def __len__(self):
+        return len(self.versions)
+
+
+    def __str__(self):
+        return ",".join(str(v) for v in self.versions)
+
+
+    def __repr__(self):
+        return "VersionCatalog(%s)" % list(self.versions)
+
+
+def _to_version_list(obj):
+    """Convert anything ver() accepts to a VersionList."""
+    obj = ver(obj)
+    return obj if type(obj) == VersionList else VersionList([obj])
+
+
+def _ends_before(a, b):
+    """True if the Version or VersionRange a ends before b does.  A
+       version covers all versions it is a prefix of, so 1.6 ends after
+       1.6.5.  None is an open end, so it is after everything."""
+    a_end, b_end = a.highest(), b.highest()
+    if a_end is None:
+        return False
+    elif b_end is None:
+        return True
+    elif b_end in a_end:
+        return False
+    elif a_end in b_end:
+        return True
+    else:
+        return a_end < b_end
+
+
 def _string_to_version(string):
     """Converts a string to a Version, VersionList, or VersionRange.
        This is private.  Client code should use ver().
@@ -705,10 +943,14 @@ def _string_to_version(string):
         return VersionList(string.split(','))
 
     elif ':' in string:
-        s, e = string.split(':')
-        start = Version(s) if s else None
-        end   = Version(e) if e else None
-        return VersionRange(start, end)
+        vrange = _version_ranges.get(string)
+        if vrange is None:
+            s, e = string.split(':')
+            start = Version(s) if s else None
+            end   = Version(e) if e else None
+            vrange = VersionRange(start, end)
+            _version_ranges[string] = vrange
+        return vrange
 
     else:
         return Version(string)
@@ -25,6 +25,7 @@
 """
 The ``virtual`` module contains utility classes for virtual dependencies.
 """
+import spack
 import spack.spec
 
 class ProviderIndex(object):
@@ -68,8 +69,16 @@ class ProviderIndex(object):
 
         assert(not spec.virtual)
 
-        pkg = spec.package
-        for provided_spec, provider_spec in pkg.provided.iteritems():
+        # Package metadata has the package's provides() directives, so
+        # there is no need to load the package here.
+        self.update_provided(spec, spack.db.metadata(spec.name).provided)
+
+
+    def update_provided(self, spec, provided):
+        """Add spec to the index as a provider of the virtual packages
+           in provided, a package's map from provided vpkg specs to the
+           provider specs that provide them."""
+        for provided_spec, provider_spec in provided.iteritems():
             if provider_spec.satisfies(spec, deps=False):
                 provided_name = provided_spec.name
                 if provided_name not in self.providers:
@@ -105,20 +114,19 @@ class ProviderIndex(object):
         return sorted(providers)
 
 
-    # TODO: this is pretty darned nasty, and inefficient.
-    def _cross_provider_maps(self, lmap, rmap):
-        result = {}
-        for lspec in lmap:
-            for rspec in rmap:
-                try:
-                    constrained = lspec.copy().constrain(rspec)
-                    if lmap[lspec].name != rmap[rspec].name:
-                        continue
-                    result[constrained] = lmap[lspec].copy().constrain(
-                        rmap[rspec], deps=False)
-                except spack.spec.UnsatisfiableSpecError:
-                    continue
-        return result
+    def provides(self, spec, vpkg_spec):
+        """Whether spec was added to this index as a provider of
+           vpkg_spec, which can be a spec or just a vpkg name.  Only
+           meaningful for restricted indexes, which store the specs
+           they were given.
+        """
+        if isinstance(vpkg_spec, basestring):
+            return any(p is spec for p in
+                       self.providers.get(vpkg_spec, {}).itervalues())
+
+        return any(p is spec and provided.satisfies(vpkg_spec, deps=False)
+                   for provided, p in
+                   self.providers.get(vpkg_spec.name, {}).iteritems())
 
 
     def __contains__(self, name):
@@ -127,16 +135,54 @@ class ProviderIndex(object):
 
 
     def satisfies(self, other):
-        """Check that providers of virtual specs are compatible."""
+        """Check that providers of virtual specs are compatible.  For
+           some vpkg in both indexes, there must be a provider of the
+           same package in each whose vpkg specs and provider specs
+           could both be constrained to agree.
+        """
         common = set(self.providers) & set(other.providers)
         if not common:
             return True
 
-        result = {}
         for name in common:
-            crossed = self._cross_provider_maps(self.providers[name],
-                                                other.providers[name])
-            if crossed:
-                result[name] = crossed
+            # Group the other index's providers by package name, so only
+            # providers of the same package are compared.
+            by_provider = {}
+            for rspec, rprovider in other.providers[name].iteritems():
+                by_provider.setdefault(rprovider.name, []).append(
+                    (rspec, rprovider))
+
+            for lspec, lprovider in self.providers[name].iteritems():
+                for rspec, rprovider in by_provider.get(lprovider.name, ()):
+                    if (_compatible(lspec, rspec) and
+                        _compatible(lprovider, rprovider)):
+                        return True
+
+        return False
+
+
+def _compatible(lspec, rspec):
+    """Whether lspec.constrain(rspec, deps=False) would succeed.  This
+       makes the same checks as Spec.constrain(), but it does not copy
+       or modify either spec.
+    """
+    if lspec.name != rspec.name:
+        return False
+
+    if not lspec.versions.overlaps(rspec.versions):
+        return False
+
+    for v in rspec.variants:
+        if (v in lspec.variants and
+            lspec.variants[v].enabled != rspec.variants[v].enabled):
+            return False
+
+    if (lspec.architecture is not None and rspec.architecture is not None and
+        lspec.architecture != rspec.architecture):
+        return False
+
+    if (lspec.compiler is not None and rspec.compiler is not None and
+        not rspec.compiler.satisfies(lspec.compiler)):
+        return False
 
-        return bool(result)
+    return True
@@ -0,0 +1,108 @@
+##############################################################################
+# Copyright (c) 2013, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory.
+#
+# This file is part of Spack.
+# Written by Todd Gamblin, tgamblin@llnl.gov, All rights reserved.
+# LLNL-CODE-647188
+#
+# For details, see https://scalability-llnl.github.io/spack
+# Please also see the LICENSE file for our notice and the LGPL.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License (as published by
+# the Free Software Foundation) version 2.1 dated February 1999.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the IMPLIED WARRANTY OF
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the terms and
+# conditions of the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+##############################################################################
+"""
+Microbenchmark for importing package files.  Imports every package
+in the package DB, which runs all of their version(), depends_on(),
+provides() and patch() directives.  Run it with:
+
+    spack python share/spack/benchmarks/package_import.py [--baseline] [repetitions]
+
+With --baseline, directives find their callers with inspect.stack(),
+as they did before they walked frames with sys._getframe().
+"""
+import os
+import sys
+import imp
+import inspect
+
+import llnl.util.lang
+
+import spack
+import spack.relations
+import spack.multimethod
+from spack.packages import _imported_packages_module
+
+# Benchmarks share helpers from this directory.
+sys.path.insert(0, os.path.dirname(os.path.abspath(sys.argv[0])))
+from timing import benchmark, baseline_requested
+
+
+def stack_caller_locals():
+    stack = inspect.stack()
+    try:
+        return stack[2][0].f_locals
+    finally:
+        del stack
+
+
+def stack_get_calling_package_name():
+    stack = inspect.stack()
+    try:
+        caller_locals = stack[2][0].f_locals
+    finally:
+        del stack
+    return caller_locals['__module__'].split('.')[-1]
+
+
+def stack_in_function(function_name):
+    stack = inspect.stack()
+    try:
+        for elt in stack[2:]:
+            if elt[3] == function_name:
+                return True
+        return False
+    finally:
+        del stack
+
+
+def use_inspect_stack():
+    """Replace the frame helpers with their inspect.stack() versions
+       everywhere directives import them."""
+    helpers = { 'caller_locals'            : stack_caller_locals,
+                'get_calling_package_name' : stack_get_calling_package_name,
+                'in_function'              : stack_in_function }
+    for module in (llnl.util.lang, spack.relations, spack.multimethod):
+        for name, helper in helpers.items():
+            if hasattr(module, name):
+                setattr(module, name, helper)
+
+
+def import_all(db):
+    """Import every package file in db as a fresh module."""
+    for name in db.all_package_names():
+        module_name = _imported_packages_module + '.' + name
+        imp.load_source(module_name, db.filename_for_package_name(name))
+
+
+def main(repetitions):
+    count = len(spack.db.all_package_names())
+    benchmark("import %d packages" % count,
+              lambda: import_all(spack.db), repetitions)
+
+
+if __name__ == '__main__':
+    if baseline_requested():
+        use_inspect_stack()
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
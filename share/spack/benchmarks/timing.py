@@ -0,0 +1,54 @@
+##############################################################################
+# Copyright (c) 2013, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory.
+#
+# This file is part of Spack.
+# Written by Todd Gamblin, tgamblin@llnl.gov, All rights reserved.
+# LLNL-CODE-647188
+#
+# For details, see https://scalability-llnl.github.io/spack
+# Please also see the LICENSE file for our notice and the LGPL.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License (as published by
+# the Free Software Foundation) version 2.1 dated February 1999.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the IMPLIED WARRANTY OF
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the terms and
+# conditions of the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+##############################################################################
+"""
+Timing helpers shared by the benchmarks in this directory.  Benchmarks
+import them after putting their own directory on sys.path, because
+``spack python`` does not do that for them.
+"""
+import sys
+import time
+
+
+def baseline_requested():
+    """Remove a --baseline argument from sys.argv and return whether it
+       was there.  With --baseline, a benchmark puts back the code path
+       that its optimization replaced, so that the two can be compared
+       on the same machine."""
+    if '--baseline' not in sys.argv:
+        return False
+    sys.argv.remove('--baseline')
+    return True
+
+
+def benchmark(name, function, repetitions):
+    """Print the best of several timings of function."""
+    best = None
+    for i in xrange(repetitions):
+        start = time.time()
+        function()
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    print "%-32s %8.4fs" % (name, best)
@@ -0,0 +1,97 @@
+##############################################################################
+# Copyright (c) 2013, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory.
+#
+# This file is part of Spack.
+# Written by Todd Gamblin, tgamblin@llnl.gov, All rights reserved.
+# LLNL-CODE-647188
+#
+# For details, see https://scalability-llnl.github.io/spack
+# Please also see the LICENSE file for our notice and the LGPL.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License (as published by
+# the Free Software Foundation) version 2.1 dated February 1999.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the IMPLIED WARRANTY OF
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the terms and
+# conditions of the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+##############################################################################
+"""
+Microbenchmark for version comparisons.  Sorts a large list of
+versions and merges large lists of versions and ranges into
+VersionLists.  Run it with:
+
+    spack python share/spack/benchmarks/versions.py [--baseline] [repetitions]
+
+With --baseline, comparisons of Versions and VersionRanges go through
+the @coerced wrapper again, as they did before they checked argument
+types inline.
+"""
+import os
+import sys
+import random
+
+from spack.version import *
+
+# Benchmarks share helpers from this directory.
+sys.path.insert(0, os.path.dirname(os.path.abspath(sys.argv[0])))
+from timing import benchmark, baseline_requested
+
+# Methods of each class that used to be decorated with @coerced.
+coerced_methods = {
+    Version      : ['__lt__', '__le__', '__gt__', '__ge__', '__eq__',
+                    '__ne__', '__contains__', 'satisfies', 'overlaps'],
+    VersionRange : ['__lt__', '__eq__'] }
+
+
+def use_coerced_comparisons():
+    """Wrap the inline-checked comparison methods with @coerced."""
+    for cls, names in coerced_methods.items():
+        for name in names:
+            setattr(cls, name, coerced(cls.__dict__[name]))
+
+
+def make_versions(n):
+    """Return n distinct versions in random order."""
+    rng = random.Random(42)
+    versions = set()
+    while len(versions) < n:
+        parts = [rng.randint(0, 30) for i in range(rng.randint(1, 4))]
+        suffix = rng.choice(['', '', '', 'a', 'b', 'rc'])
+        versions.add(Version('.'.join(str(p) for p in parts) + suffix))
+    versions = list(versions)
+    rng.shuffle(versions)
+    return versions
+
+
+def make_ranges(versions):
+    """Return ranges between neighboring pairs of sorted versions."""
+    ordered = sorted(versions)
+    return [VersionRange(ordered[i], ordered[i+1])
+            for i in xrange(0, len(ordered) - 1, 2)]
+
+
+def main(repetitions):
+    versions = make_versions(5000)
+    ranges = make_ranges(versions[:2000])
+
+    benchmark("sort 5000 versions",
+              lambda: sorted(versions), repetitions)
+    benchmark("VersionList of 5000 versions",
+              lambda: VersionList(versions), repetitions)
+    benchmark("VersionList of 1000 ranges",
+              lambda: VersionList(ranges), repetitions)
+    benchmark("VersionList of versions+ranges",
+              lambda: VersionList(versions[:2000] + ranges), repetitions)
+
+
+if __name__ == '__main__':
+    if baseline_requested():
+        use_coerced_comparisons()
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
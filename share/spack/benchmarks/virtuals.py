@@ -0,0 +1,149 @@
+##############################################################################
+# Copyright (c) 2013, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory.
+#
+# This file is part of Spack.
+# Written by Todd Gamblin, tgamblin@llnl.gov, All rights reserved.
+# LLNL-CODE-647188
+#
+# For details, see https://scalability-llnl.github.io/spack
+# Please also see the LICENSE file for our notice and the LGPL.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License (as published by
+# the Free Software Foundation) version 2.1 dated February 1999.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the IMPLIED WARRANTY OF
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the terms and
+# conditions of the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+##############################################################################
+"""
+Benchmark for concretizing specs with deep chains of virtual
+dependencies.  This writes a temporary package repository where the
+root package depends on virtual package v0, each vN is provided by
+two packages, and each of those depends on v(N+1) and on a few
+regular packages.  Run it with:
+
+    spack python share/spack/benchmarks/virtuals.py [--baseline] [depth] [repetitions]
+
+With --baseline, virtual dependencies are expanded by renormalizing the
+whole DAG after each round of provider choices, as they were before
+only new providers were normalized.
+"""
+import os
+import sys
+import shutil
+import tempfile
+
+from llnl.util.filesystem import mkdirp, join_path
+
+import spack
+from spack.packages import PackageDB
+from spack.package import DependencyValidationCache
+from spack.spec import Spec
+from spack.util.naming import mod_to_class
+
+# Benchmarks share helpers from this directory.
+sys.path.insert(0, os.path.dirname(os.path.abspath(sys.argv[0])))
+from timing import benchmark, baseline_requested
+
+# Regular packages each provider depends on.
+width = 4
+
+package_template = """\
+from spack import *
+
+class %(class_name)s(Package):
+    homepage = "http://www.example.com"
+    url      = "http://www.example.com/%(name)s-1.0.tar.gz"
+
+    version('2.0', 'abcdef0123456789abcdef0123456789')
+    version('1.0', '0123456789abcdef0123456789abcdef')
+%(directives)s
+    def install(self, spec, prefix):
+        pass
+"""
+
+
+def write_package(root, name, *directives):
+    pkg_dir = join_path(root, name)
+    mkdirp(pkg_dir)
+    with open(join_path(pkg_dir, 'package.py'), 'w') as pkg_file:
+        pkg_file.write(package_template % {
+            'name' : name,
+            'class_name' : mod_to_class(name),
+            'directives' : ''.join("    %s\n" % d for d in directives) })
+
+
+def make_repo(root, depth):
+    """Write a chain of depth virtual packages, each with two providers."""
+    write_package(root, 'chainroot', "depends_on('v0')")
+    for level in range(depth):
+        libs = ['lib%d_%d' % (level, i) for i in range(width)]
+        for lib in libs:
+            write_package(root, lib)
+
+        deps = ["depends_on('%s')" % lib for lib in libs]
+        if level + 1 < depth:
+            deps.append("depends_on('v%d')" % (level + 1))
+
+        for provider in ('a', 'b'):
+            write_package(root, 'prov%d%s' % (level, provider),
+                          "provides('v%d')" % level, *deps)
+
+
+def renormalizing_expand_virtual_packages(self, concretizer):
+    """Replace virtuals with providers, then renormalize the DAG, until
+       there are no virtuals left."""
+    while True:
+        virtuals = [v for v in self.traverse() if v.virtual]
+        if not virtuals:
+            return
+
+        for spec in virtuals:
+            providers = spack.db.providers_for(spec)
+            concrete = concretizer.choose_provider(spec, providers)
+            spec._replace_with(concrete.copy())
+
+        self.normalize(force=True)
+
+
+def main(depth, repetitions):
+    repo = tempfile.mkdtemp()
+    cache_dir = tempfile.mkdtemp()
+    real_db = spack.db
+    real_cache_path = spack.cache_path
+    real_validation_cache = spack.dependency_validation_cache
+    try:
+        # Keep the generated packages out of Spack's own caches.
+        spack.cache_path = cache_dir
+        spack.dependency_validation_cache = DependencyValidationCache(
+            join_path(cache_dir, 'validated_dependencies.json'))
+        make_repo(repo, depth)
+        spack.db = PackageDB(repo)
+
+        # Load all the packages once so that imports are not timed.
+        concrete = Spec('chainroot').concretized()
+
+        benchmark("concretize chain of %d virtuals (%d nodes)"
+                  % (depth, len(list(concrete.traverse()))),
+                  lambda: Spec('chainroot').concretized(), repetitions)
+    finally:
+        spack.db = real_db
+        spack.cache_path = real_cache_path
+        spack.dependency_validation_cache = real_validation_cache
+        shutil.rmtree(repo)
+        shutil.rmtree(cache_dir)
+
+
+if __name__ == '__main__':
+    if baseline_requested():
+        Spec._expand_virtual_packages = renormalizing_expand_virtual_packages
+    depth = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    repetitions = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    main(depth, repetitions)